@@ -0,0 +1,425 @@
+"""
+Load benchmark for the MCP servers in this repository.
+
+Starts filesystem/filesystem_server.py and server.py over stdio, builds
+synthetic trees (many small files, a few huge files, one very wide
+directory), drives every tool at a configurable concurrency and reports
+p50/p99 latency, throughput and the server's peak RSS. Results can be saved
+as a baseline and later runs compared against it to catch regressions.
+
+    python benchmarks/benchmark.py --concurrency 8 --requests 200
+    python benchmarks/benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmarks/benchmark.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "filesystem": os.path.join(REPO_ROOT, "filesystem", "filesystem_server.py"),
+    "demo": os.path.join(REPO_ROOT, "server.py"),
+}
+
+# Metrics where a larger value is a regression, and where a smaller one is
+HIGHER_IS_WORSE = ("p50_ms", "p99_ms", "peak_rss_kb")
+LOWER_IS_WORSE = ("throughput_per_s",)
+
+
+def build_trees(root: str, scale: float) -> dict:
+    """
+    Create the synthetic trees the workloads run against.
+
+    Args:
+        root: Empty directory to build the trees in
+        scale: Multiplier for file counts and sizes
+
+    Returns:
+        Dictionary of paths used by the workloads
+    """
+    small = os.path.join(root, "small")
+    small_count = max(1, int(2000 * scale))
+    for i in range(small_count):
+        directory = os.path.join(small, f"d{i % 50:02d}", f"e{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"f{i:05d}.txt"), "w") as file:
+            file.write(f"line {i}\n" * 100 + ("needle\n" if i % 97 == 0 else ""))
+
+    huge = os.path.join(root, "huge")
+    os.makedirs(huge)
+    huge_size = max(1, int(64 * 1024 * 1024 * scale))
+    block = (b"0123456789abcdef" * 4095 + b"needle line here\n")
+    for i in range(2):
+        with open(os.path.join(huge, f"big{i}.log"), "wb") as file:
+            written = 0
+            while written < huge_size:
+                file.write(block)
+                written += len(block)
+
+    wide = os.path.join(root, "wide")
+    os.makedirs(wide)
+    for i in range(max(1, int(20000 * scale))):
+        open(os.path.join(wide, f"entry{i:06d}"), "w").close()
+
+    scratch = os.path.join(root, "scratch")
+    os.makedirs(scratch)
+    with open(os.path.join(root, "sample.txt"), "w") as file:
+        file.write("sample line\n" * 100)
+    archive = os.path.join(root, "subtree.tar.gz")
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(os.path.join(small, "d00"), "d00")
+    return {
+        "root": root,
+        "small": small,
+        "small_file": os.path.join(small, "d00", "e0", "f00000.txt"),
+        "small_files": [os.path.join(small, f"d{i % 50:02d}", f"e{i % 7}", f"f{i:05d}.txt")
+                        for i in range(min(small_count, 200))],
+        "small_subtree": os.path.join(small, "d00"),
+        "huge": huge,
+        "huge_file": os.path.join(huge, "big0.log"),
+        "wide": wide,
+        "scratch": scratch,
+        "archive": archive,
+    }
+
+
+def _scratch(paths: dict, name: str, i: int, content: str = None) -> str:
+    path = os.path.join(paths["scratch"], f"{name}-{i}")
+    if content is not None:
+        with open(path, "w") as file:
+            file.write(content)
+    return path
+
+
+def filesystem_workloads(paths: dict) -> dict:
+    """
+    Workloads covering every filesystem server tool and resource.
+
+    Each workload is a pair of (prepare, run): prepare(i) does any untimed
+    setup and returns state; run(session, state) is the timed part.
+    """
+    async def call(session, name, args):
+        result = await session.call_tool(name, args)
+        if result.isError:
+            raise RuntimeError(f"{name} failed: {result.content}")
+        return result
+
+    def tool(name, make_args):
+        async def run(session, args):
+            return await call(session, name, args)
+        return make_args, run
+
+    def resource(make_uri):
+        async def run(session, uri):
+            return await session.read_resource(uri)
+        return make_uri, run
+
+    async def upload(session, path):
+        upload_id = (await call(session, "begin_upload", {"path": path})).content[0].text
+        await call(session, "upload_chunk", {"upload_id": upload_id, "content": "a" * 4096})
+        await call(session, "upload_chunk", {"upload_id": upload_id, "content": "b" * 4096})
+        await call(session, "commit_upload", {"upload_id": upload_id})
+
+    async def aborted_upload(session, path):
+        upload_id = (await call(session, "begin_upload", {"path": path})).content[0].text
+        await call(session, "abort_upload", {"upload_id": upload_id})
+
+    async def job_lifecycle(session, state):
+        result = await call(session, "copy_tree", {**state, "background": True})
+        job_id = result.content[0].text
+        await call(session, "get_job", {"job_id": job_id})
+        await call(session, "cancel_job", {"job_id": job_id})
+        while json.loads((await call(session, "get_job", {"job_id": job_id})).content[0].text)["status"] in ("pending", "running"):
+            await asyncio.sleep(0.001)
+
+    async def archive_stream(session, args):
+        result = json.loads((await call(session, "pack_tree", args)).content[0].text)
+        offset = 0
+        while True:
+            chunk = json.loads((await call(
+                session, "read_archive", {"archive_id": result["archive_id"], "offset": offset})).content[0].text)
+            offset = chunk["next_offset"]
+            if chunk["eof"]:
+                break
+        await call(session, "release_archive", {"archive_id": result["archive_id"]})
+
+    async def watch_changes(session, args):
+        result = await call(session, "watch_changes", args)
+        cursor = json.loads(result.content[0].text)["cursor"]
+        await call(session, "watch_changes", {**args, "cursor": cursor})
+
+    patch = "@@ -1,2 +1,2 @@\n line 0\n-line 0\n+line zero\n"
+
+    return {
+        "list_directory": tool("list_directory", lambda i: {"path": paths["small_subtree"]}),
+        "list_directory_paged_wide": tool("list_directory", lambda i: {"path": paths["wide"], "page_size": 500, "include_details": True}),
+        "read_file": tool("read_file", lambda i: {"path": paths["small_file"]}),
+        "read_file_range_huge": tool("read_file", lambda i: {"path": paths["huge_file"], "offset": (i * 65536) % (32 * 1024 * 1024), "length": 65536}),
+        "write_file": tool("write_file", lambda i: {"path": _scratch(paths, "write", i), "content": "x" * 4096}),
+        "write_file_append": tool("write_file", lambda i: {"path": _scratch(paths, "append", 0), "content": "y" * 1024, "mode": "append"}),
+        "upload_session": (lambda i: _scratch(paths, "upload", i), upload),
+        "abort_upload": (lambda i: _scratch(paths, "aborted", i), aborted_upload),
+        "replace_range": tool("replace_range", lambda i: {"path": _scratch(paths, "edit", i, "line 0\n" * 100), "edits": [{"start": 2, "end": 3, "content": "edited\n"}]}),
+        "apply_patch": tool("apply_patch", lambda i: {"path": _scratch(paths, "patch", i, "line 0\n" * 100), "patch": patch}),
+        "delete_file": tool("delete_file", lambda i: {"path": _scratch(paths, "delete", i, "")}),
+        "create_directory": tool("create_directory", lambda i: {"path": os.path.join(paths["scratch"], f"mkdir-{i}")}),
+        "delete_directory": tool("delete_directory", lambda i: {"path": os.makedirs(os.path.join(paths["scratch"], f"rmdir-{i}", "sub")) or os.path.join(paths["scratch"], f"rmdir-{i}"), "recursive": True}),
+        "file_exists": tool("file_exists", lambda i: {"path": paths["small_file"]}),
+        "directory_exists": tool("directory_exists", lambda i: {"path": paths["small"]}),
+        "copy_file": tool("copy_file", lambda i: {"source": paths["small_file"], "destination": _scratch(paths, "copy", i)}),
+        "copy_tree": tool("copy_tree", lambda i: {"source": paths["small_subtree"], "destination": os.path.join(paths["scratch"], f"tree-{i}")}),
+        "move_file": tool("move_file", lambda i: {"source": _scratch(paths, "move-src", i, "move"), "destination": _scratch(paths, "move-dst", i)}),
+        "get_file_size": tool("get_file_size", lambda i: {"path": paths["small_file"]}),
+        "files_exist": tool("files_exist", lambda i: {"paths": paths["small_files"]}),
+        "directories_exist": tool("directories_exist", lambda i: {"paths": [paths["small"], paths["wide"], paths["huge"]]}),
+        "get_file_sizes": tool("get_file_sizes", lambda i: {"paths": paths["small_files"]}),
+        "get_files_info": tool("get_files_info", lambda i: {"paths": paths["small_files"]}),
+        "read_files": tool("read_files", lambda i: {"paths": paths["small_files"]}),
+        "get_directory_summary": tool("get_directory_summary", lambda i: {"path": paths["small"]}),
+        "disk_usage": tool("disk_usage", lambda i: {"path": paths["root"]}),
+        "find_files": tool("find_files", lambda i: {"root": paths["root"], "pattern": "f0001*.txt"}),
+        "grep_files": tool("grep_files", lambda i: {"root": paths["small"], "pattern": "needle", "max_results": 50}),
+        "hash_files": tool("hash_files", lambda i: {"paths": paths["small_files"][:50]}),
+        "find_duplicates": tool("find_duplicates", lambda i: {"root": paths["small_subtree"]}),
+        "job_lifecycle": (lambda i: {"source": paths["small_subtree"], "destination": os.path.join(paths["scratch"], f"job-{i}")}, job_lifecycle),
+        "list_jobs": tool("list_jobs", lambda i: {}),
+        "get_cache_stats": tool("get_cache_stats", lambda i: {}),
+        "watch_changes": (lambda i: {"root": paths["scratch"]}, watch_changes),
+        "pack_tree": tool("pack_tree", lambda i: {"source": paths["small_subtree"], "destination": _scratch(paths, "pack", i) + ".tar.gz"}),
+        "archive_stream": (lambda i: {"source": paths["small_subtree"], "format": "zip"}, archive_stream),
+        "unpack_archive": tool("unpack_archive", lambda i: {"source": paths["archive"], "destination": os.path.join(paths["scratch"], f"unpack-{i}")}),
+        # Resource templates only match a single path segment, so these name
+        # entries relative to the server's working directory (the tree root).
+        # file:// is left out: pydantic normalises file://name to file://name/,
+        # which the file://{path} template never matches
+        "resource_dir_small": resource(lambda i: "dir://small"),
+        "resource_dir_wide": resource(lambda i: "dir://wide"),
+        "resource_dir_summary": resource(lambda i: "dir-summary://small"),
+    }
+
+
+def demo_workloads(paths: dict) -> dict:
+    """Workloads covering every tool and resource of server.py."""
+    async def add(session, args):
+        return await session.call_tool("add", args)
+
+    async def greeting(session, uri):
+        return await session.read_resource(uri)
+
+    async def cache_stats(session, args):
+        return await session.call_tool("get_cache_stats", args)
+
+    return {
+        "add": (lambda i: {"a": i % 10, "b": 1}, add),
+        "resource_greeting": (lambda i: f"greeting://user{i % 10}", greeting),
+        "get_cache_stats": (lambda i: {}, cache_stats),
+    }
+
+
+WORKLOADS = {"filesystem": filesystem_workloads, "demo": demo_workloads}
+
+
+def _child_pids() -> set:
+    """PIDs of this process's direct children, from /proc (Linux only)."""
+    pids = set()
+    try:
+        for task in os.listdir(f"/proc/{os.getpid()}/task"):
+            with open(f"/proc/{os.getpid()}/task/{task}/children") as file:
+                pids.update(int(pid) for pid in file.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def _peak_rss_kb(pid: int):
+    """Peak resident set size of a process in KiB, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+@asynccontextmanager
+async def start_server(script: str, env: dict, cwd: str):
+    """Start a server script over stdio and yield (session, pid)."""
+    before = _child_pids()
+    params = StdioServerParameters(command=sys.executable, args=[script], env=env, cwd=cwd)
+    async with stdio_client(params) as (read, write):
+        new = _child_pids() - before
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session, (min(new) if new else None)
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_workload(session, prepare, run, requests: int, concurrency: int) -> dict:
+    """
+    Issue requests calls of one workload, concurrency at a time.
+
+    Returns:
+        Dictionary with request/error counts, the first error, p50/p99 latency
+        and throughput
+    """
+    states = [prepare(i) for i in range(requests)]
+    latencies = []
+    errors = 0
+    first_error = None
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors, first_error
+        while next_index < requests:
+            state = states[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                await run(session, state)
+            except Exception as e:
+                errors += 1
+                first_error = first_error or f"{type(e).__name__}: {e}"
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "first_error": first_error,
+        "p50_ms": _percentile(latencies, 0.50),
+        "p99_ms": _percentile(latencies, 0.99),
+        "throughput_per_s": len(latencies) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+async def benchmark_server(name: str, paths: dict, args) -> dict:
+    """Run every selected workload against one server and collect its results."""
+    env = {"FILESYSTEM_MCP_DIGEST_CACHE": os.path.join(paths["root"], "digests.sqlite3")}
+    workloads = WORKLOADS[name](paths)
+    if args.workload:
+        workloads = {key: value for key, value in workloads.items() if key in args.workload}
+
+    results = {}
+    async with start_server(SERVERS[name], env, paths["root"]) as (session, pid):
+        for workload, (prepare, run) in workloads.items():
+            result = await run_workload(session, prepare, run, args.requests, args.concurrency)
+            result["peak_rss_kb"] = _peak_rss_kb(pid) if pid else None
+            results[workload] = result
+            print(f"{name:>10} {workload:<28} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                  f"{result['throughput_per_s']:9.1f}/s  rss {result['peak_rss_kb'] or 0:>8} KiB  "
+                  f"errors {result['errors']}", flush=True)
+            if result["first_error"]:
+                print(f"{'':>10} {'':<28} first error: {result['first_error'][:300]}", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare results with a baseline.
+
+    Returns:
+        Human-readable descriptions of metrics that regressed beyond tolerance,
+        and of workloads with more failed requests than in the baseline
+    """
+    regressions = []
+    for server, workloads in results.items():
+        for workload, metrics in workloads.items():
+            reference = baseline.get(server, {}).get(workload)
+            if reference is None:
+                continue
+            if metrics["errors"] > reference.get("errors", 0):
+                regressions.append(f"{server}/{workload} errors: {reference.get('errors', 0)} -> {metrics['errors']}")
+            for metric in HIGHER_IS_WORSE + LOWER_IS_WORSE:
+                current, previous = metrics.get(metric), reference.get(metric)
+                # Zero is a real value (a workload whose requests all failed has
+                # no throughput); only a missing or zero reference can't be compared
+                if current is None or not previous:
+                    continue
+                change = (current - previous) / previous
+                if metric in LOWER_IS_WORSE:
+                    change = -change
+                if change > tolerance:
+                    regressions.append(f"{server}/{workload} {metric}: {previous:.2f} -> {current:.2f} "
+                                       f"({change:+.0%} worse)")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=sorted(SERVERS) + ["all"], default="all")
+    parser.add_argument("--workload", action="append", help="Only run this workload (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per workload")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for synthetic tree sizes")
+    parser.add_argument("--tree-dir", help="Build the synthetic trees here instead of a temp directory")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON file")
+    parser.add_argument("--save-baseline", help="Save these results as a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    root = args.tree_dir or tempfile.mkdtemp(prefix="mcp-bench-")
+    os.makedirs(root, exist_ok=True)
+    try:
+        print(f"Building synthetic trees in {root} ...", flush=True)
+        paths = build_trees(root, args.scale)
+        servers = sorted(SERVERS) if args.server == "all" else [args.server]
+        results = {}
+        for name in servers:
+            results[name] = await benchmark_server(name, paths, args)
+    finally:
+        if not args.tree_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    failing = [f"{server}/{workload} ({metrics['errors']} of {metrics['requests']} failed: {metrics['first_error']})"
+               for server, workloads in results.items() for workload, metrics in workloads.items()
+               if metrics["errors"]]
+
+    report = {"settings": {"concurrency": args.concurrency, "requests": args.requests, "scale": args.scale},
+              "results": results}
+    for target in (args.output, args.save_baseline):
+        if target:
+            with open(target, "w") as file:
+                json.dump(report, file, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print("No regressions against baseline")
+    # A workload whose requests fail measures nothing useful, so fail the run
+    for workload in failing:
+        print(f"ERRORS {workload}")
+    if regressions or failing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,20 +3,102 @@ from typing import Optional
 from contextlib import AsyncExitStack 
 import asyncio 
 from mcp import ClientSession, StdioServerParameters 
+from mcp import types as mcp_types 
 from mcp.client.stdio  import stdio_client 
+from mcp.client.sse import sse_client 
 # from anthropic import Anthropic 
 from dotenv import load_dotenv 
-import ollama
 
 from google import genai
 from google.genai import types
 from google.generativeai.types import FunctionDeclaration, Tool
 
 import os
+import re
 
 load_dotenv() 
 # load environment variables from .env 
 
+MODEL = "gemini-2.0-flash"
+
+# Upper bound on model turns per query, and on concurrent calls to any one tool
+MAX_AGENT_STEPS = 10
+TOOL_CONCURRENCY = 4
+
+# Seconds to wait for a server to complete the initialize handshake
+CONNECT_TIMEOUT = 30
+
+# Separates the server prefix from the tool name in merged tool names
+TOOL_PREFIX_SEPARATOR = "__"
+
+
+
+class ServerConnection: 
+    """A session with one MCP server, kept open by its own task until closed""" 
+
+    def __init__(self, name: str, target: str, on_tools_changed=None): 
+        self.name = name 
+        self.target = target 
+        self.session: Optional[ClientSession] = None 
+        self.error: Optional[BaseException] = None 
+        self._on_tools_changed = on_tools_changed 
+        self._ready = asyncio.Event() 
+        self._closed = asyncio.Event() 
+        self._task: Optional[asyncio.Task] = None 
+
+    def _transport(self): 
+        if self.target.startswith(("http://", "https://")): 
+            return sse_client(self.target) 
+        is_python = self.target.endswith('.py') 
+        if not (is_python or self.target.endswith('.js')): 
+            raise ValueError("Server must be a .py or .js script or an http(s) SSE URL") 
+        server_params = StdioServerParameters( 
+            command="python" if is_python else "node", 
+            args=[self.target], 
+            env=None 
+            ) 
+        return stdio_client(server_params) 
+
+    async def start(self): 
+        # Transport contexts must be exited by the task that entered them, so each 
+        # server gets its own task; this also lets servers start concurrently. 
+        self._task = asyncio.create_task(self._run()) 
+        await self._ready.wait() 
+        if self.error is not None: 
+            raise self.error 
+
+    async def _run(self): 
+        try: 
+            async with self._transport() as (read, write): 
+                async with ClientSession(read, write) as session: 
+                    # A server that dies during startup never answers, so bound the wait 
+                    await asyncio.wait_for(session.initialize(), CONNECT_TIMEOUT) 
+                    self.session = session 
+                    self._ready.set() 
+                    watcher = asyncio.create_task(self._watch_notifications()) 
+                    try: 
+                        await self._closed.wait() 
+                    finally: 
+                        watcher.cancel() 
+        except Exception as e: 
+            self.error = e 
+        finally: 
+            self.session = None 
+            self._ready.set() 
+
+    async def _watch_notifications(self): 
+        """Report tools/list_changed notifications from this server""" 
+        # The session's receive loop blocks until notifications are read, so 
+        # this also keeps the session flowing. 
+        async for message in self.session.incoming_messages: 
+            if isinstance(getattr(message, "root", None), mcp_types.ToolListChangedNotification): 
+                if self._on_tools_changed is not None: 
+                    self._on_tools_changed() 
+
+    async def close(self): 
+        self._closed.set() 
+        if self._task is not None: 
+            await self._task 
 
 
 class MCPClient: 
@@ -24,6 +106,13 @@ class MCPClient:
         # Initialize session and client objects 
         self.session: Optional[ClientSession] = None 
         self.exit_stack = AsyncExitStack() 
+        self.servers = {} 
+        self.tools = [] 
+        # Merged tool name -> (server name, tool name on that server) 
+        self.tool_routes = {} 
+        # Gemini tool config built from every server's tools; None until (re)built 
+        self._tool_config: Optional[types.GenerateContentConfig] = None 
+        self._tool_semaphores = {} 
         # # self.anthropic = Anthropic() 
         # # methods will go here 
         # print(os.getenv("API_KEY"))
@@ -32,31 +121,89 @@ class MCPClient:
     async def connect_to_server(self, server_script_path: str): 
         """Connect to an MCP server 
         Args: server_script_path: Path to the server script (.py or .js) """ 
+        await self.connect_to_servers([server_script_path]) 
+
+    def _server_name(self, target: str) -> str: 
+        """Derive a unique tool-name prefix for a server script or URL""" 
+        base = target.rstrip("/").split("//")[-1] 
+        base = os.path.splitext(os.path.basename(base))[0] or base 
+        name = re.sub(r"[^A-Za-z0-9_]", "_", base) 
+        unique, index = name, 2 
+        while unique in self.servers: 
+            unique, index = f"{name}{index}", index + 1 
+        return unique 
+
+    async def connect_to_servers(self, targets): 
+        """Connect to several MCP servers at once 
+        Args: targets: Server scripts (.py or .js) or SSE URLs, as a list or as a 
+        dict mapping the tool prefix to use for each server to its script or URL """ 
+        if not isinstance(targets, dict): 
+            targets = {self._server_name(target): target for target in targets} 
         
-        is_python = server_script_path.endswith('.py') 
-        is_js = server_script_path.endswith('.js') 
-        if not (is_python or is_js): 
-            raise ValueError("Server script must be a .py or .js file") 
-        
-        command = "python" if is_python else "node" 
-        server_params = StdioServerParameters( 
-            command=command, 
-            args=[server_script_path], 
-            env=None 
-            ) 
-        
-        stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params)) 
-        self.stdio, self.write = stdio_transport 
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write)) 
+        connections = [ServerConnection(name, target, self._invalidate_tools) for name, target in targets.items()] 
+        results = await asyncio.gather(*[connection.start() for connection in connections], return_exceptions=True) 
+        for connection, result in zip(connections, results): 
+            if isinstance(result, BaseException): 
+                print(f"\nFailed to connect to {connection.target}: {result}") 
+                continue 
+            self.servers[connection.name] = connection 
+        if not self.servers: 
+            raise ConnectionError("Could not connect to any MCP server") 
+        self.session = next(iter(self.servers.values())).session 
         
-        await self.session.initialize() 
-        
-        # List available tools 
-        response = await self.session.list_tools() 
-        tools = response.tools 
-        print("\nConnected to server with tools:", [tool.name for tool in tools]) 
+        # List available tools and build their declarations once for all queries 
+        self._tool_config = None 
+        await self.get_tool_config() 
+        print("\nConnected to servers with tools:", list(self.tool_routes)) 
+
+    def _invalidate_tools(self): 
+        self._tool_config = None 
     
+    async def get_tool_config(self) -> types.GenerateContentConfig: 
+        """Return the Gemini config declaring the servers' tools, listing them only when not cached. 
+        Servers that are down or fail to list their tools are skipped with a warning, and the 
+        config is rebuilt on the next call until every server has answered""" 
+        if self._tool_config is not None: 
+            return self._tool_config 
+        
+        servers = list(self.servers.values()) 
+        responses = await asyncio.gather(*[self._list_tools(server) for server in servers], return_exceptions=True) 
+        self.tools = [] 
+        self.tool_routes = {} 
+        failures = [] 
+        for server, response in zip(servers, responses): 
+            if isinstance(response, Exception): 
+                reason = str(response) or type(response).__name__ 
+                print(f"\nSkipping tools of {server.name} ({server.target}): {reason}") 
+                failures.append(f"{server.name}: {reason}") 
+                continue 
+            for tool in response.tools: 
+                merged_name = f"{server.name}{TOOL_PREFIX_SEPARATOR}{tool.name}" 
+                self.tool_routes[merged_name] = (server.name, tool.name) 
+                self.tools.append((merged_name, tool)) 
+        if failures and len(failures) == len(servers): 
+            raise ConnectionError("No MCP server could list its tools: " + "; ".join(failures)) 
+        function_declarations = [
+            FunctionDeclaration(
+                name=merged_name,
+                description=tool.description,
+                parameters=self.clean_input_schema(tool.inputSchema)
+            ).to_proto()
+            for merged_name, tool in self.tools
+        ]
+        config = types.GenerateContentConfig(
+            tools=[Tool(function_declarations=function_declarations)]
+        )
+        if not failures: 
+            self._tool_config = config 
+        return config 
     
+    async def _list_tools(self, server: ServerConnection): 
+        """List one server's tools, failing clearly if its session has gone away""" 
+        if server.session is None: 
+            raise ConnectionError(f"server is not connected ({server.error or 'session closed'})") 
+        # A hung server must not stall every query, so bound the wait like the handshake 
+        return await asyncio.wait_for(server.session.list_tools(), CONNECT_TIMEOUT) 
     
     def clean_input_schema(self, input_schema: dict) -> dict:
     # Remove top-level title and keep only the allowed top-level fields
@@ -72,8 +219,25 @@ class MCPClient:
 
         return schema
     
-    async def process_query(self, query: str) -> str: 
-        """Process a query using Claude and available tools""" 
+    async def call_tool(self, tool_name: str, tool_args: dict) -> dict: 
+        """Call one MCP tool by its merged name on the server that provides it, 
+        at most TOOL_CONCURRENCY calls per tool at a time, and return its result 
+        as a function response payload""" 
+        route = self.tool_routes.get(tool_name) 
+        if route is None: 
+            return {"error": f"Unknown tool: {tool_name}"} 
+        server_name, server_tool_name = route 
+        semaphore = self._tool_semaphores.setdefault(tool_name, asyncio.Semaphore(TOOL_CONCURRENCY)) 
+        async with semaphore: 
+            try: 
+                result = await self.servers[server_name].session.call_tool(server_tool_name, tool_args) 
+            except Exception as e: 
+                return {"error": str(e)} 
+        output = [content.text if content.type == "text" else content.model_dump() for content in result.content] 
+        return {"error": output} if result.isError else {"result": output} 
+    
+    async def process_query(self, query: str, max_steps: int = MAX_AGENT_STEPS) -> str: 
+        """Process a query using Gemini and available tools""" 
         # messages = [ 
         #     { 
         #         "role": "user", 
@@ -89,90 +253,45 @@ class MCPClient:
         ]
 
         model_name = "llama3.1:latest"
-        response = await self.session.list_tools() 
-        # print(dict(response.tools[0]))
-        print(response.tools[0])
-
-        function_declarations = []
-        function_declarations = [
-            FunctionDeclaration(
-                name=tool.name,
-                description=tool.description,
-                parameters=self.clean_input_schema(tool.inputSchema)
-            ).to_proto()
-            for tool in response.tools
-        ]
-
-
-        tools = [Tool(function_declarations=function_declarations)]
-
-        config = types.GenerateContentConfig(tools=tools)
-        
-
-        response = self.client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=contents,
-        config=config,
-        )
 
-       
-
-
-        # Initial Claude API call 
-        # 
-        # response = self.anthropic.messages.create( model="claude-3-5-sonnet-20241022", max_tokens=1000, messages=messages, tools=available_tools ) 
+        config = await self.get_tool_config()
         
 
-        # response = ollama.chat(
-        #     model_name,
-        #     messages=messages,
-        #     tools=available_tools, # Actual function reference
-        #     )
-        print(response)
-
-        # Process response and handle tool calls 
-        # 
         final_text = [] 
-        
-        assistant_message_content = [] 
 
+        # Agent loop: each turn the model may request several tools at once; 
+        # run them concurrently and feed all results back in one message. 
+        for _ in range(max_steps): 
+            response = await self.client.aio.models.generate_content(
+                model=MODEL,
+                contents=contents,
+                config=config,
+            )
 
-        if response.candidates[0].content.parts[0].function_call:
-            function_call = response.candidates[0].content.parts[0].function_call
-            print(f"Function to call: {function_call.name}")
-            print(f"Arguments: {function_call.args}")
+            model_content = response.candidates[0].content
+            function_calls = [part.function_call for part in (model_content.parts or []) if part.function_call]
+            if not function_calls:
+                final_text.append(response.text or "")
+                break
 
-            tool_name = function_call.name
-            tool_args = function_call.args
+            contents.append(model_content)
+            for function_call in function_calls:
+                final_text.append(f"[Calling tool {function_call.name} with args {function_call.args}]") 
+
+            results = await asyncio.gather(*[
+                self.call_tool(function_call.name, dict(function_call.args or {}))
+                for function_call in function_calls
+            ])
 
-            result = await self.session.call_tool(tool_name, tool_args) 
-                
-            final_text.append(f"[Calling tool {tool_name} with args {tool_args}]") 
-            
-            assistant_message_content.append(response.message.content) 
-            
-            contents.append(types.Content(
-                role="user", parts=[types.Part(text=assistant_message_content)]
-            )) 
-            
             contents.append(types.Content(
-                role="user", parts=[types.Part(text=result.content)]
-            )) 
-            #  In a real app, you would call your function here:
-            #  result = schedule_meeting(**function_call.args)
+                role="user",
+                parts=[
+                    types.Part.from_function_response(name=function_call.name, response=result)
+                    for function_call, result in zip(function_calls, results)
+                ]
+            ))
         else:
-            # print("No function call found in the response.")
-            # print(response.text)
-
-            final_text.append(response.text)
-            assistant_message_content.append(response.text)
-
-        response = self.client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=contents,
-            config=config,
-            )
-        final_text.append(response.text)
+            final_text.append(f"[Stopped after {max_steps} steps without a final answer]")
 
         # for tool in response.message.tool_calls or []:
         #     function_to_call = available_functions.get(tool.function.name)
@@ -277,13 +396,15 @@ class MCPClient:
     async def cleanup(self): 
         
         """Clean up resources""" 
+        await asyncio.gather(*[server.close() for server in self.servers.values()]) 
+        self.servers = {} 
         await self.exit_stack.aclose() 
         
 async def main(): 
         
     client = MCPClient() 
     # try: 
-    await client.connect_to_server(server_script_path="github_server.py") 
+    await client.connect_to_servers(["server.py", "filesystem/filesystem_server.py"]) 
     # await client.process_query("what is the sum of 5 and 6?")
         # await client.chat_loop() 
     
@@ -297,7 +418,6 @@ async def main():
     print("shutdown") 
         
 if __name__ == "__main__": 
-    import sys 
     # print("start")
     asyncio.run(main()) 
     # print("now")
\ No newline at end of file
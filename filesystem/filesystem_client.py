@@ -6,6 +6,7 @@ import os
 import dotenv
 import asyncio
 from autogen_agentchat.teams import MagenticOneGroupChat
+from autogen_core.tools import StaticWorkbench, ToolOverride
 from autogen_agentchat.ui import Console
 
 dotenv.load_dotenv()
@@ -13,8 +14,14 @@ dotenv.load_dotenv()
 gemini_api_key = os.environ['API_KEY']
 
 
-# Get the fetch tool from mcp-server-fetch.
+# MCP servers whose tools the agent can use, by the prefix their tool names
+# get (as in client.py); they are started concurrently.
 fetch_mcp_server = StdioServerParams(command=".venv/bin/python3", args=["filesystem/filesystem_server.py"])
+demo_mcp_server = StdioServerParams(command=".venv/bin/python3", args=["server.py"])
+mcp_servers = {"filesystem_server": fetch_mcp_server, "server": demo_mcp_server}
+
+# Separates the server prefix from the tool name in merged tool names
+TOOL_PREFIX_SEPARATOR = "__"
 
 
 async def main():
@@ -28,9 +35,17 @@ async def main():
         )
     # print("model client loaded")
 
-    tools =  await mcp_server_tools(fetch_mcp_server)
+    server_tools = await asyncio.gather(*[mcp_server_tools(server) for server in mcp_servers.values()])
+    # Servers share tool names (both have get_cache_stats), so each server's
+    # tools are offered as <server>__<tool> and calls are mapped back to them
+    workbenches = [
+        StaticWorkbench(tools, tool_overrides={
+            tool.name: ToolOverride(name=f"{prefix}{TOOL_PREFIX_SEPARATOR}{tool.name}") for tool in tools
+        })
+        for prefix, tools in zip(mcp_servers, server_tools)
+    ]
     file_agent = AssistantAgent(
-        name="file_agent", model_client=model_client, tools=tools, reflect_on_tool_use=True
+        name="file_agent", model_client=model_client, workbench=workbenches, reflect_on_tool_use=True
     )
 
     team = MagenticOneGroupChat([file_agent], model_client=model_client)
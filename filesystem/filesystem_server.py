@@ -1,258 +1,3875 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
+import base64
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import functools
+import gzip
+import hashlib
+import heapq
+import importlib.machinery
+import itertools
+import json
+import multiprocessing
 import os
+import re
+import select
 import shutil
-from typing import List, Optional
+import sqlite3
+import stat
+import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import weakref
+import zipfile
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+from pydantic import AnyUrl
+
+# Helpers shared with the other servers live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memoize import memoize, memo_stats
+from metrics import instrument
+from offload import offload, offload_stats
+from serve import current_session_id, serve
+from grep_worker import grep_file
 
 mcp = FastMCP("FileSystemMCP")
+instrument(mcp)
+
+# Upper bound on bytes returned by a single ranged read_file call
+MAX_READ_BYTES = 1024 * 1024
+
+# read_file results kept by the memoization layer, and the largest one kept
+MEMO_READ_ENTRIES = 256
+MEMO_MAX_READ_CHARS = 256 * 1024
+
+# Default number of entries per list_directory page
+DEFAULT_PAGE_SIZE = 1000
+
+# list_directory sort keys and the entry field each one sorts by
+LIST_SORT_KEYS = {"name": "name", "size": "size", "mtime": "modified_time"}
+
+ENTRY_TYPES = ("file", "dir", "symlink", "other")
+
+# Threads used to scan directories in parallel when walking a tree
+WALK_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Items disk_usage remembers (each directory, subdirectory name, largest file
+# and hard link kept counts as one, so memory stays bounded however files are
+# spread), how long a directory's file sizes are trusted while its mtime is
+# unchanged (files can grow in place without touching it), and the most
+# subtrees and files one call reports
+DISK_USAGE_CACHE_ITEMS = 1000000
+DISK_USAGE_CACHE_TTL = 600.0
+MAX_DISK_USAGE_TOP = 100
+
+WRITE_MODES = ("overwrite", "append", "offset")
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Size of the stat cache behind file_exists, directory_exists, get_file_size
+# and file://, and the longest an entry is trusted without inotify confirming it
+STAT_CACHE_MAX_ENTRIES = 10000
+STAT_CACHE_TTL = 5.0
+
+# Threads used by copy_tree, and the largest chunk handed to one copy syscall
+COPY_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+COPY_CHUNK_BYTES = 64 * 1024 * 1024
+
+# ioctl request that clones a file's extents on reflink-capable filesystems
+FICLONE = 0x40049409
+
+# Formats pack_tree writes, threads compressing and extracting archives, the
+# uncompressed size of each independently gzipped tar.gz block, and the most
+# packed archives the server holds for read_archive at once
+ARCHIVE_FORMATS = ("tar.gz", "tar", "zip")
+ARCHIVE_WORKERS = os.cpu_count() or 1
+ARCHIVE_BLOCK_BYTES = 1024 * 1024
+MAX_ARCHIVE_BLOBS = 16
+
+# Seconds an open upload or a held archive may go unused before it is
+# discarded, so sessions that disconnect without cleaning up don't leak files
+TRANSFER_IDLE_TTL = 3600.0
+
+# On-disk digest cache used by hash_files and find_duplicates, and the read
+# size used while hashing
+DIGEST_CACHE_PATH = os.environ.get(
+    "FILESYSTEM_MCP_DIGEST_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "filesystem_mcp", "digests.sqlite3")
+)
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Threads running background jobs, and how many finished jobs are remembered
+JOB_WORKERS = 4
+MAX_FINISHED_JOBS = 100
+
+# Maximum number of roots find_files keeps an index for
+MAX_PATH_INDEXES = 8
+
+# Trees watched for watch_changes at once (subscribed directories don't count),
+# events each one remembers, seconds between rescans where inotify is
+# unavailable, and raw events consumed by one watch_changes call by default
+MAX_CHANGE_FEEDS = 8
+MAX_CHANGE_BACKLOG = 10000
+CHANGE_POLL_INTERVAL = 2.0
+DEFAULT_CHANGE_EVENTS = 1000
+
+# Threads used by the batched path tools, the most paths one batch may hold,
+# and the most bytes one read_files call returns across all its files
+BATCH_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+MAX_BATCH_PATHS = 10000
+MAX_BATCH_READ_BYTES = 16 * 1024 * 1024
+
+# Worker processes used by grep_files, and files handed to them per round
+GREP_WORKERS = os.cpu_count() or 1
+GREP_BATCH_SIZE = 256
+
+# Threads that run blocking tools off the event loop, calls allowed to run at
+# once, calls allowed to wait for a slot before new ones are rejected, and the
+# longest a call may take in seconds (0 for no limit)
+TOOL_WORKERS = int(os.environ.get("FILESYSTEM_MCP_WORKERS", min(32, (os.cpu_count() or 1) * 4)))
+MAX_CONCURRENT_CALLS = int(os.environ.get("FILESYSTEM_MCP_MAX_CONCURRENT", TOOL_WORKERS))
+MAX_QUEUED_CALLS = int(os.environ.get("FILESYSTEM_MCP_MAX_QUEUED", 256))
+TOOL_TIMEOUT = float(os.environ.get("FILESYSTEM_MCP_TOOL_TIMEOUT", 300))
+
+# Calls allowed to run at once for tools that already fan out to their own pools;
+# a resource that wraps one of them names that tool to share its limit
+TOOL_CONCURRENCY = {
+    "grep_files": 2,
+    "find_duplicates": 2,
+    "hash_files": 4,
+    "find_files": 4,
+    "copy_tree": 4,
+    "get_directory_summary": 4,
+    "dir-summary://{path}": "get_directory_summary",
+    "disk_usage": 4,
+    "get_files_info": 8,
+    "read_files": 8,
+    "get_file_sizes": 8,
+    "files_exist": 8,
+    "directories_exist": 8
+}
+
+# inotify event bits, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_INOTIFY_EVENT_SIZE = struct.calcsize("iIII")
+# Events watched on every directory: anything that changes a child or the directory itself
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+offload(mcp, TOOL_WORKERS, MAX_CONCURRENT_CALLS, MAX_QUEUED_CALLS, TOOL_TIMEOUT or None, TOOL_CONCURRENCY)
+
+# Path indexes built by find_files, least recently used first
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="fs-batch")
+
+_job_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="fs-job")
+
+# Background jobs by job id, oldest first
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+_grep_pool = None
+_grep_pool_lock = threading.Lock()
+
+# Open chunked uploads by upload id, each with the time it was last used
+_uploads = {}
+_uploads_lock = threading.Lock()
+
+# Archives packed by pack_tree without a destination, by archive id, each
+# with the time it was last used; path is None while the archive is packed
+_archives = {}
+_archives_lock = threading.Lock()
+
+# Change feeds by (root, recursive), least recently used first
+_feeds = OrderedDict()
+_feeds_lock = threading.Lock()
+
+# Resource subscriptions by URI: the path, the directory whose feed serves it,
+# and a weak reference to and the event loop of each subscribed session by token
+_subscriptions = {}
+_subscriptions_lock = threading.Lock()
+
+# Token of each session with subscriptions, held weakly so that a session that
+# disconnects without unsubscribing still releases its subscriptions
+_subscriber_tokens = weakref.WeakKeyDictionary()
+
+def _entry_type(entry: os.DirEntry) -> str:
+    """
+    Classify a directory entry from the type information returned by scandir.
+    
+    Args:
+        entry: Entry yielded by os.scandir
+        
+    Returns:
+        One of "symlink", "dir", "file" or "other"
+    """
+    if entry.is_symlink():
+        return "symlink"
+    if entry.is_dir(follow_symlinks=False):
+        return "dir"
+    if entry.is_file(follow_symlinks=False):
+        return "file"
+    return "other"
+
+def _encode_cursor(state: list) -> str:
+    """
+    Encode pagination state as an opaque cursor string.
+    
+    Args:
+        state: JSON-serialisable pagination state
+        
+    Returns:
+        Cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+def _decode_cursor(cursor: str) -> list:
+    """
+    Decode a cursor produced by _encode_cursor.
+    
+    Args:
+        cursor: Cursor string
+        
+    Returns:
+        The pagination state
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+class _Inotify:
+    """
+    Minimal non-blocking binding to Linux inotify through ctypes.
+    
+    Watches are added per directory; read_events drains whatever the kernel
+    has queued without waiting, so callers can poll it before serving a request.
+    """
+    
+    def __init__(self, mask: int):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc = libc
+        self._mask = mask
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._paths = {}
+        self._wds = {}
+    
+    def add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self._mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        self._paths[wd] = path
+        self._wds[path] = wd
+    
+    def remove_watch(self, path: str) -> None:
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+    
+    def remove_tree(self, path: str) -> None:
+        prefix = path + os.sep
+        for watched in [p for p in self._wds if p == path or p.startswith(prefix)]:
+            self.remove_watch(watched)
+    
+    def read_events(self) -> list:
+        """
+        Drain queued events.
+        
+        Returns:
+            List of (mask, cookie, path) tuples; path is None for queue overflows
+        """
+        events = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            position = 0
+            while position < len(buffer):
+                wd, mask, cookie, length = struct.unpack_from("iIII", buffer, position)
+                position += _INOTIFY_EVENT_SIZE
+                name = buffer[position:position + length].rstrip(b"\0")
+                position += length
+                if mask & IN_IGNORED:
+                    directory = self._paths.pop(wd, None)
+                    if directory is not None:
+                        self._wds.pop(directory, None)
+                    continue
+                directory = self._paths.get(wd)
+                if directory is None:
+                    events.append((mask, cookie, None))
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                events.append((mask, cookie, path))
+    
+    def fileno(self) -> int:
+        return self._fd
+    
+    def close(self) -> None:
+        os.close(self._fd)
+
+def _open_inotify(mask: int) -> Optional[_Inotify]:
+    """
+    Open an inotify instance if the platform supports it.
+    
+    Args:
+        mask: Event mask used for every watch
+        
+    Returns:
+        An _Inotify, or None when inotify is unavailable
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return _Inotify(mask)
+    except (OSError, AttributeError):
+        return None
+
+class _StatCache:
+    """
+    Bounded LRU cache of os.stat results, including negative results.
+    
+    Entries are dropped as soon as inotify reports a change in their parent
+    directory, and in any case after STAT_CACHE_TTL seconds, which also covers
+    changes inotify cannot see (remote writes on network mounts, symlink
+    targets). Tools that modify the filesystem invalidate the paths they touch.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.children = {}
+        self.hits = 0
+        self.misses = 0
+        self.watcher = None
+        self._watcher_opened = False
+    
+    def _open_watcher(self) -> None:
+        # Opened lazily so that importing the module does not take an inotify instance
+        self._watcher_opened = True
+        self.watcher = _open_inotify(_WATCH_MASK)
+    
+    def _drop(self, path: str) -> None:
+        if self.entries.pop(path, None) is None:
+            return
+        parent = os.path.dirname(path)
+        siblings = self.children.get(parent)
+        if siblings is None:
+            return
+        siblings.discard(path)
+        if not siblings:
+            del self.children[parent]
+            if self.watcher is not None:
+                self.watcher.remove_watch(parent)
+    
+    def _drain_events(self) -> None:
+        if self.watcher is None:
+            return
+        for mask, _, path in self.watcher.read_events():
+            if path is None or mask & IN_Q_OVERFLOW:
+                self._clear()
+                return
+            self._drop(path)
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF) or mask & IN_ISDIR:
+                self._drop_tree(path)
+    
+    def _drop_tree(self, path: str) -> None:
+        prefix = path + os.sep
+        for cached in [p for p in self.entries if p == path or p.startswith(prefix)]:
+            self._drop(cached)
+    
+    def _clear(self) -> None:
+        for path in list(self.entries):
+            self._drop(path)
+    
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        Stat a path, following symlinks, through the cache.
+        
+        Args:
+            path: Path to stat
+            
+        Returns:
+            The stat result, or None if the path does not exist
+        """
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        with self.lock:
+            if not self._watcher_opened:
+                self._open_watcher()
+            self._drain_events()
+            cached = self.entries.get(path)
+            if cached is not None and cached[1] > now:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+        
+        try:
+            result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            result = None
+        
+        with self.lock:
+            self._drop(path)
+            parent = os.path.dirname(path)
+            if parent not in self.children and self.watcher is not None:
+                try:
+                    self.watcher.add_watch(parent)
+                except OSError:
+                    # Parent missing or out of watches; rely on the TTL alone
+                    pass
+            self.entries[path] = (result, now + self.ttl)
+            self.children.setdefault(parent, set()).add(path)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+        return result
+    
+    def invalidate(self, path: str) -> None:
+        """
+        Forget a path and, if it is a directory, everything cached below it.
+        
+        Args:
+            path: Path that was modified
+        """
+        with self.lock:
+            self._drop_tree(os.path.abspath(path))
+    
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "inotify": self.watcher is not None
+            }
+
+_stat_cache = _StatCache(STAT_CACHE_MAX_ENTRIES, STAT_CACHE_TTL)
 
 @mcp.tool()
-def list_directory(path: str) -> List[str]:
+def list_directory(path: str, page_size: Optional[int] = None, cursor: Optional[str] = None,
+                   sort: str = "name", reverse: bool = False, pattern: Optional[str] = None,
+                   entry_type: Optional[str] = None, include_details: bool = False) -> Union[List[str], dict]:
     """
     List contents of a directory.
     
+    With only a path, all entry names are returned. With any other argument the
+    directory is read in a single scandir pass and returned one page at a time:
+    only page_size entries are kept in memory, and the cursor records the sort
+    key of the last entry so the next page resumes right after it. When
+    sorting by name, only the entries on the returned page are stat'ed.
+    
     Args:
         path: Path to directory
+        page_size: Maximum number of entries per page (defaults to DEFAULT_PAGE_SIZE)
+        cursor: next_cursor from the previous page
+        sort: Sort key, one of "name", "size" or "mtime"
+        reverse: Sort in descending order
+        pattern: Only include entries whose name matches this glob
+        entry_type: Only include entries of this type ("file", "dir", "symlink" or "other")
+        include_details: Include type, size and mtime for each entry
         
     Returns:
-        List of file and directory names in the specified directory
+        List of file and directory names in the specified directory, or for paged
+        listings a dictionary with the entries and next_cursor (None on the last page)
     """
     if not os.path.exists(path):
         raise ValueError(f"Path does not exist: {path}")
     if not os.path.isdir(path):
         raise ValueError(f"Path is not a directory: {path}")
     
-    return os.listdir(path)
+    paged = (page_size is not None or cursor is not None or sort != "name" or reverse
+             or pattern is not None or entry_type is not None or include_details)
+    if not paged:
+        return os.listdir(path)
+    
+    if sort not in LIST_SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    if entry_type is not None and entry_type not in ENTRY_TYPES:
+        raise ValueError(f"Unknown entry type: {entry_type}")
+    if page_size is None:
+        page_size = DEFAULT_PAGE_SIZE
+    if page_size <= 0:
+        raise ValueError(f"Page size must be positive: {page_size}")
+    
+    after = None
+    if cursor is not None:
+        state = _decode_cursor(cursor)
+        if state[0] != sort or state[1] != reverse:
+            raise ValueError("Cursor was created with a different sort order")
+        after = tuple(state[2])
+    
+    def details(entry, info):
+        try:
+            stat_info = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return None
+        info["size"] = stat_info.st_size
+        info["modified_time"] = stat_info.st_mtime
+        return info
+    
+    def candidates():
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if pattern is not None and not fnmatch.fnmatch(entry.name, pattern):
+                    continue
+                if sort == "name":
+                    # Names are compared with the cursor before anything is stat'ed,
+                    # so only the entries that end up on the page are stat'ed below
+                    key = (entry.name,)
+                    if after is not None and (key <= after if not reverse else key >= after):
+                        continue
+                kind = _entry_type(entry)
+                if entry_type is not None and kind != entry_type:
+                    continue
+                info = {"name": entry.name, "type": kind}
+                if sort != "name":
+                    if details(entry, info) is None:
+                        continue
+                    key = (info[LIST_SORT_KEYS[sort]], entry.name)
+                    if after is not None and (key <= after if not reverse else key >= after):
+                        continue
+                yield key, (entry, info)
+    
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    # Fetch one extra entry to learn whether another page follows
+    page = select(page_size + 1, candidates(), key=lambda item: item[0])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = _encode_cursor([sort, reverse, list(page[-1][0])])
+    
+    if include_details and sort == "name":
+        # Entries removed since the scan are left out of the page
+        page = [(key, (entry, info)) for key, (entry, info) in page if details(entry, info) is not None]
+    page = [(key, info) for key, (entry, info) in page]
+    entries = [info if include_details else info["name"] for _, info in page]
+    return {"path": path, "entries": entries, "next_cursor": next_cursor}
 
-@mcp.tool()
-def read_file(path: str) -> str:
+def _utf8_boundary(data: bytes) -> int:
     """
-    Read contents of a file.
+    Find the length of the longest prefix of data that does not end inside
+    a multi-byte UTF-8 sequence.
     
     Args:
-        path: Path to file
+        data: Raw bytes sliced from a file
         
     Returns:
-        Contents of the file as a string
+        Number of leading bytes that can be decoded without splitting a character
     """
-    if not os.path.exists(path):
-        raise ValueError(f"File does not exist: {path}")
-    if not os.path.isfile(path):
-        raise ValueError(f"Path is not a file: {path}")
-    
-    with open(path, 'r') as file:
-        return file.read()
+    end = len(data)
+    # A UTF-8 sequence is at most 4 bytes, so only the tail needs checking
+    for back in range(1, min(4, end) + 1):
+        byte = data[end - back]
+        if byte & 0x80 == 0:
+            return end
+        if byte & 0xC0 == 0xC0:
+            needed = 2 if byte & 0xE0 == 0xC0 else 3 if byte & 0xF0 == 0xE0 else 4
+            return end if back >= needed else end - back
+    return end
 
-@mcp.tool()
-def write_file(path: str, content: str) -> bool:
+def _small_read(result: Union[str, dict]) -> bool:
     """
-    Write content to a file.
+    Decide whether a read_file result is small enough to memoize.
     
     Args:
-        path: Path to file
-        content: Content to write
+        result: Value returned by read_file
         
     Returns:
-        True if successful
+        True if its content is at most MEMO_MAX_READ_CHARS characters
     """
-    with open(path, 'w') as file:
-        file.write(content)
-    return True
+    content = result if isinstance(result, str) else result["content"]
+    return len(content) <= MEMO_MAX_READ_CHARS
 
 @mcp.tool()
-def delete_file(path: str) -> bool:
+@memoize(maxsize=MEMO_READ_ENTRIES, path_args=("path",), cacheable=_small_read)
+def read_file(path: str, offset: int = 0, length: Optional[int] = None,
+              start_line: Optional[int] = None, max_lines: Optional[int] = None) -> Union[str, dict]:
     """
-    Delete a file.
+    Read contents of a file, optionally only a slice of it.
+    
+    With no range arguments the whole file is returned as a string. When any of
+    offset, length, start_line or max_lines is given, only the requested bytes
+    are read with positioned reads and decoded, so slicing a huge file costs
+    only the size of the slice (plus a scan for start_line). The file is not
+    memory-mapped: a file truncated mid-read, such as a log rotated with
+    copytruncate, just yields a shorter slice.
     
     Args:
         path: Path to file
+        offset: Byte offset to start reading from (use next_offset to continue)
+        length: Maximum number of bytes to return (defaults to MAX_READ_BYTES)
+        start_line: Number of lines to skip after offset before reading (0-based)
+        max_lines: Maximum number of lines to return
         
     Returns:
-        True if successful
+        Contents of the file as a string, or for ranged reads a dictionary with
+        the content, the byte offset it starts at, next_offset to continue from,
+        the total file size and whether the end of the file was reached
     """
     if not os.path.exists(path):
         raise ValueError(f"File does not exist: {path}")
     if not os.path.isfile(path):
         raise ValueError(f"Path is not a file: {path}")
     
-    os.remove(path)
-    return True
+    if offset == 0 and length is None and start_line is None and max_lines is None:
+        with open(path, 'r') as file:
+            return file.read()
+    
+    if offset < 0:
+        raise ValueError(f"Offset must be non-negative: {offset}")
+    if length is not None and length <= 0:
+        raise ValueError(f"Length must be positive: {length}")
+    if start_line is not None and start_line < 0:
+        raise ValueError(f"Start line must be non-negative: {start_line}")
+    if max_lines is not None and max_lines <= 0:
+        raise ValueError(f"Max lines must be positive: {max_lines}")
+    if length is None:
+        length = MAX_READ_BYTES
+    
+    with open(path, 'rb') as file:
+        fd = file.fileno()
+        size = os.fstat(fd).st_size
+        if offset >= size:
+            return {"path": path, "content": "", "offset": offset,
+                    "next_offset": size, "size": size, "eof": True}
+        
+        start = offset
+        skip = start_line or 0
+        while skip and start < size:
+            chunk = os.pread(fd, min(MAX_READ_BYTES, size - start), start)
+            if not chunk:
+                break
+            newline = -1
+            while skip:
+                newline = chunk.find(b"\n", newline + 1)
+                if newline == -1:
+                    break
+                skip -= 1
+            start += len(chunk) if newline == -1 else newline + 1
+        
+        data = os.pread(fd, max(min(start + length, size) - start, 0), start)
+        if start + len(data) < min(start + length, size):
+            # The file shrank since it was stat'ed
+            size = start + len(data)
+        end = start + len(data)
+        if max_lines is not None:
+            position = 0
+            for _ in range(max_lines):
+                newline = data.find(b"\n", position)
+                if newline == -1:
+                    position = len(data)
+                    break
+                position = newline + 1
+            data = data[:position]
+            end = start + len(data)
+    
+    if end < size and _utf8_boundary(data) > 0:
+        data = data[:_utf8_boundary(data)]
+    next_offset = start + len(data)
+    
+    return {
+        "path": path,
+        "content": data.decode("utf-8", errors="replace"),
+        "offset": start,
+        "next_offset": next_offset,
+        "size": size,
+        "eof": next_offset >= size
+    }
 
-@mcp.tool()
-def create_directory(path: str) -> bool:
+def _temp_path_for(path: str) -> str:
     """
-    Create a directory.
+    Create an empty temporary file next to path so it can later be renamed over it.
+    
+    Symlinks are resolved first, so the temporary file sits next to the file
+    that will actually be replaced.
     
     Args:
-        path: Path to new directory
+        path: Destination file path
         
     Returns:
-        True if successful
+        Path of the new temporary file
     """
-    if os.path.exists(path):
-        raise ValueError(f"Path already exists: {path}")
+    target = os.path.realpath(path)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=f".{os.path.basename(target)}.",
+                                     suffix=".tmp")
+    os.close(fd)
+    return temp_path
+
+def _commit_temp_file(temp_path: str, path: str) -> None:
+    """
+    Flush a temporary file to disk and atomically rename it over path.
     
-    os.makedirs(path)
-    return True
+    If path is a symlink, the file it points to is replaced and the link is
+    kept. An existing file keeps its mode and, where permitted, its owner and
+    group. A file with other hard links is rewritten in place instead, since
+    renaming over it would split it from its other names.
+    
+    Args:
+        temp_path: Fully written temporary file
+        path: Destination file path
+    """
+    target = os.path.realpath(path)
+    try:
+        existing = os.stat(target)
+    except FileNotFoundError:
+        existing = None
+    if existing is not None and not stat.S_ISREG(existing.st_mode):
+        existing = None
+    
+    if existing is not None and existing.st_nlink > 1:
+        with open(temp_path, 'rb') as source, open(target, 'r+b') as destination:
+            shutil.copyfileobj(source, destination, HASH_CHUNK_BYTES)
+            destination.truncate()
+            os.fsync(destination.fileno())
+        os.remove(temp_path)
+    else:
+        if existing is not None:
+            try:
+                os.chown(temp_path, existing.st_uid, existing.st_gid)
+            except OSError:
+                # Only root may give files away; keep the caller's ownership
+                pass
+            # After chown, which clears the setuid and setgid bits
+            os.chmod(temp_path, stat.S_IMODE(existing.st_mode))
+        else:
+            # mkstemp creates files as 0600; give new files the usual permissions
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        with open(temp_path, 'rb') as file:
+            os.fsync(file.fileno())
+        os.replace(temp_path, target)
+    if target != os.path.abspath(path):
+        _stat_cache.invalidate(target)
 
 @mcp.tool()
-def delete_directory(path: str, recursive: bool = False) -> bool:
+def write_file(path: str, content: str, mode: str = "overwrite", offset: Optional[int] = None) -> bool:
     """
-    Delete a directory.
+    Write content to a file.
+    
+    Overwrites go through a temporary file that is renamed into place, so
+    readers never see a half-written file.
     
     Args:
-        path: Path to directory
-        recursive: If True, recursively delete directory and its contents
+        path: Path to file
+        content: Content to write
+        mode: "overwrite" to replace the file, "append" to add to the end of it,
+            or "offset" to write over the bytes starting at offset
+        offset: Byte offset to write at, required when mode is "offset"
         
     Returns:
         True if successful
     """
-    if not os.path.exists(path):
-        raise ValueError(f"Directory does not exist: {path}")
-    if not os.path.isdir(path):
-        raise ValueError(f"Path is not a directory: {path}")
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode: {mode}")
+    if os.path.isdir(path):
+        raise ValueError(f"Path is a directory: {path}")
     
-    if recursive:
-        shutil.rmtree(path)
+    if mode == "append":
+        with open(path, 'a') as file:
+            file.write(content)
+    elif mode == "offset":
+        if offset is None or offset < 0:
+            raise ValueError(f"Offset mode requires a non-negative offset: {offset}")
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as file:
+            file.seek(offset)
+            file.write(content.encode("utf-8"))
     else:
-        os.rmdir(path)
+        temp_path = _temp_path_for(path)
+        try:
+            with open(temp_path, 'w') as file:
+                file.write(content)
+            _commit_temp_file(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    _stat_cache.invalidate(path)
     return True
 
+def _expire_idle(entries: dict, lock: threading.Lock, path_key: str) -> None:
+    """
+    Forget uploads or archives unused for TRANSFER_IDLE_TTL seconds and delete their files.
+    
+    Args:
+        entries: _uploads or _archives
+        lock: Lock guarding entries
+        path_key: Key of each entry's file path
+    """
+    cutoff = time.monotonic() - TRANSFER_IDLE_TTL
+    with lock:
+        expired = [key for key, entry in entries.items()
+                   if entry[path_key] is not None and entry["used"] < cutoff]
+        paths = [entries.pop(key)[path_key] for key in expired]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _get_upload(upload_id: str) -> dict:
+    """
+    Look up an open upload session.
+    
+    Args:
+        upload_id: Id returned by begin_upload
+        
+    Returns:
+        The upload session dictionary
+    """
+    upload = _uploads.get(upload_id)
+    # Uploads belong to the client session that began them
+    if upload is None or upload["owner"] != current_session_id():
+        raise ValueError(f"Unknown upload id: {upload_id}")
+    upload["used"] = time.monotonic()
+    return upload
+
 @mcp.tool()
-def file_exists(path: str) -> bool:
+def begin_upload(path: str) -> str:
     """
-    Check if a file exists.
+    Start a chunked upload that replaces a file atomically when committed.
+    
+    Chunks are written to a temporary file next to the destination; the
+    destination is untouched until commit_upload renames it into place.
+    Uploads unused for TRANSFER_IDLE_TTL seconds are discarded.
     
     Args:
-        path: Path to file
+        path: Destination file path
         
     Returns:
-        True if file exists, False otherwise
+        Upload id to pass to upload_chunk, commit_upload and abort_upload
     """
-    return os.path.isfile(path)
+    if os.path.isdir(path):
+        raise ValueError(f"Path is a directory: {path}")
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        raise ValueError(f"Directory does not exist: {directory}")
+    
+    _expire_idle(_uploads, _uploads_lock, "temp_path")
+    upload_id = uuid.uuid4().hex
+    with _uploads_lock:
+        _uploads[upload_id] = {"path": path, "temp_path": _temp_path_for(path), "size": 0,
+                              "owner": current_session_id(), "used": time.monotonic()}
+    return upload_id
 
 @mcp.tool()
-def directory_exists(path: str) -> bool:
+def upload_chunk(upload_id: str, content: str, offset: Optional[int] = None, encoding: str = "utf-8") -> int:
     """
-    Check if a directory exists.
+    Write one chunk of an upload.
     
     Args:
-        path: Path to directory
+        upload_id: Id returned by begin_upload
+        content: Chunk content
+        offset: Byte offset to write the chunk at; defaults to the end of the upload
+        encoding: "utf-8" for text, or "base64" for binary data such as archives
         
     Returns:
-        True if directory exists, False otherwise
+        Current size of the uploaded data in bytes
     """
-    return os.path.isdir(path)
+    upload = _get_upload(upload_id)
+    if encoding == "utf-8":
+        data = content.encode("utf-8")
+    elif encoding == "base64":
+        try:
+            data = base64.b64decode(content, validate=True)
+        except ValueError:
+            raise ValueError(f"Invalid base64 content for upload: {upload_id}")
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    with _uploads_lock:
+        position = upload["size"] if offset is None else offset
+        if position < 0:
+            raise ValueError(f"Offset must be non-negative: {offset}")
+        with open(upload["temp_path"], 'r+b') as file:
+            file.seek(position)
+            file.write(data)
+        upload["size"] = max(upload["size"], position + len(data))
+        return upload["size"]
 
 @mcp.tool()
-def copy_file(source: str, destination: str) -> bool:
+def commit_upload(upload_id: str) -> bool:
     """
-    Copy a file from source to destination.
+    Finish an upload by atomically renaming it over the destination file.
     
     Args:
-        source: Source file path
-        destination: Destination file path
+        upload_id: Id returned by begin_upload
         
     Returns:
         True if successful
     """
-    if not os.path.exists(source):
-        raise ValueError(f"Source file does not exist: {source}")
-    if not os.path.isfile(source):
-        raise ValueError(f"Source path is not a file: {source}")
-    
-    shutil.copy2(source, destination)
+    with _uploads_lock:
+        upload = _get_upload(upload_id)
+        del _uploads[upload_id]
+    _commit_temp_file(upload["temp_path"], upload["path"])
+    _stat_cache.invalidate(upload["path"])
     return True
 
 @mcp.tool()
-def move_file(source: str, destination: str) -> bool:
+def abort_upload(upload_id: str) -> bool:
     """
-    Move a file from source to destination.
+    Discard an upload, leaving the destination file untouched.
     
     Args:
-        source: Source file path
-        destination: Destination file path
+        upload_id: Id returned by begin_upload
         
     Returns:
         True if successful
     """
-    if not os.path.exists(source):
-        raise ValueError(f"Source file does not exist: {source}")
-    if not os.path.isfile(source):
-        raise ValueError(f"Source path is not a file: {source}")
-    
-    shutil.move(source, destination)
+    with _uploads_lock:
+        upload = _get_upload(upload_id)
+        del _uploads[upload_id]
+    if os.path.exists(upload["temp_path"]):
+        os.remove(upload["temp_path"])
     return True
 
-@mcp.tool()
-def get_file_size(path: str) -> int:
+def _read_for_edit(path: str, expected_hash: Optional[str]) -> bytes:
     """
-    Get the size of a file in bytes.
+    Read a file that is about to be edited and check it against the caller's hash.
     
     Args:
         path: Path to file
+        expected_hash: SHA-256 hex digest the caller last saw, or None to skip the check
         
     Returns:
-        Size of the file in bytes
+        Contents of the file
     """
     if not os.path.exists(path):
         raise ValueError(f"File does not exist: {path}")
     if not os.path.isfile(path):
         raise ValueError(f"Path is not a file: {path}")
     
-    return os.path.getsize(path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    if expected_hash is not None and hashlib.sha256(data).hexdigest() != expected_hash.lower():
+        raise ValueError(f"File has changed since it was read (hash mismatch): {path}")
+    return data
 
-@mcp.resource("file://{path}")
-def get_file_info(path: str) -> dict:
+def _write_edit(path: str, data: bytes) -> dict:
     """
-    Get information about a file.
+    Atomically replace a file with edited contents.
     
     Args:
         path: Path to file
+        data: New contents
         
     Returns:
-        Dictionary with file information
+        Dictionary with the path, new size and new SHA-256 hash
     """
-    if not os.path.exists(path):
-        raise ValueError(f"Path does not exist: {path}")
+    temp_path = _temp_path_for(path)
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        _commit_temp_file(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _stat_cache.invalidate(path)
+    return {"path": path, "size": len(data), "hash": hashlib.sha256(data).hexdigest()}
+
+@mcp.tool()
+def replace_range(path: str, edits: List[dict], unit: str = "line", expected_hash: Optional[str] = None) -> dict:
+    """
+    Replace ranges of a file in place, without sending the whole file.
     
-    stat_info = os.stat(path)
-    return {
-        "path": path,
-        "size": stat_info.st_size,
-        "is_file": os.path.isfile(path),
-        "is_dir": os.path.isdir(path),
-        "modified_time": stat_info.st_mtime,
-        "created_time": stat_info.st_ctime,
-        "accessed_time": stat_info.st_atime
-    }
+    Each edit is {"start", "end", "content"}. With unit "line", start and end
+    are 1-based line numbers and the range is inclusive (use end = start - 1 to
+    insert before line start). Content without a trailing newline keeps the
+    line ending of the last line it replaces, so the file's final newline (or
+    lack of one) survives; inserted lines get one of their own. With unit
+    "byte", they are byte offsets and the range is half-open. Edits must not
+    overlap; all are applied atomically.
+    
+    Args:
+        path: Path to file
+        edits: Ranges to replace and their new content
+        unit: "line" or "byte"
+        expected_hash: SHA-256 of the file the edits were made against (see hash_files);
+            the edit is rejected if the file no longer matches
+        
+    Returns:
+        Dictionary with the path, new size and new hash, for chaining further edits
+    """
+    if unit not in ("line", "byte"):
+        raise ValueError(f"Unknown unit: {unit}")
+    data = _read_for_edit(path, expected_hash)
+    
+    if unit == "line":
+        lines = data.splitlines(keepends=True)
+        newline = b"\r\n" if lines and lines[0].endswith(b"\r\n") else b"\n"
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+    
+    spans = []
+    for edit in edits:
+        try:
+            start, end, content = int(edit["start"]), int(edit["end"]), edit["content"]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Edits need integer start and end and a content string: {edit}")
+        replacement = content.encode("utf-8")
+        if unit == "line":
+            if start < 1 or end < start - 1 or end > len(lines):
+                raise ValueError(f"Line range out of bounds: {start}-{end} (file has {len(lines)} lines)")
+            if replacement and not replacement.endswith(b"\n"):
+                if end >= start:
+                    last = lines[end - 1]
+                    replacement += last[len(last.rstrip(b"\r\n")):]
+                elif start <= len(lines):
+                    replacement += newline
+                elif lines and not lines[-1].endswith((b"\n", b"\r")):
+                    # Appending to a file without a final newline: start a new line
+                    replacement = newline + replacement
+                elif lines:
+                    replacement += newline
+            start, end = offsets[start - 1], offsets[end]
+        elif start < 0 or end < start or end > len(data):
+            raise ValueError(f"Byte range out of bounds: {start}-{end} (file has {len(data)} bytes)")
+        spans.append((start, end, replacement))
+    
+    spans.sort(key=lambda span: (span[0], span[1]))
+    for previous, current in zip(spans, spans[1:]):
+        if current[0] < previous[1]:
+            raise ValueError("Edits overlap")
+    
+    pieces = []
+    position = 0
+    for start, end, replacement in spans:
+        pieces.append(data[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(data[position:])
+    return _write_edit(path, b"".join(pieces))
 
-@mcp.resource("dir://{path}")
-def get_directory_info(path: str) -> dict:
+def _split_lines(text: str) -> List[str]:
     """
-    Get information about a directory.
+    Split text into lines that keep their endings, breaking only after "\n".
+    
+    Unlike str.splitlines, form feeds, \x1c-\x1e, \x85 and \u2028 stay inside
+    their line, as they do in files and diffs.
     
     Args:
-        path: Path to directory
+        text: Text to split
         
     Returns:
-        Dictionary with directory information
+        Lines, each ending in "\n" except possibly the last
     """
-    if not os.path.exists(path):
-        raise ValueError(f"Path does not exist: {path}")
-    if not os.path.isdir(path):
-        raise ValueError(f"Path is not a directory: {path}")
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+def _parse_unified_diff(patch: str) -> List[tuple]:
+    """
+    Parse the hunks of a single-file unified diff.
     
-    contents = os.listdir(path)
-    files = [f for f in contents if os.path.isfile(os.path.join(path, f))]
-    dirs = [d for d in contents if os.path.isdir(os.path.join(path, d))]
+    Args:
+        patch: Unified diff text; file headers are optional
+        
+    Returns:
+        List of (old_start, old_lines, new_lines) tuples, where the line lists
+        hold lines with their line endings
+    """
+    hunks = []
+    current = None
+    for line in _split_lines(patch):
+        if line.startswith("@@"):
+            match = re.match(r"@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@", line)
+            if match is None:
+                raise ValueError(f"Invalid hunk header: {line.rstrip()}")
+            current = (int(match.group(1)), [], [])
+            hunks.append(current)
+            last = None
+        elif current is None:
+            # File headers and anything else before the first hunk
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file" applies to the line before it
+            for block in last or ():
+                block[-1] = block[-1].rstrip("\r\n")
+        else:
+            marker, text = line[:1], line[1:]
+            if not text.endswith("\n"):
+                text += "\n"
+            if marker == " " or line in ("\n", "\r\n"):
+                current[1].append(text)
+                current[2].append(text)
+                last = (current[1], current[2])
+            elif marker == "-":
+                current[1].append(text)
+                last = (current[1],)
+            elif marker == "+":
+                current[2].append(text)
+                last = (current[2],)
+            else:
+                raise ValueError(f"Invalid line in hunk: {line.rstrip()}")
+    if not hunks:
+        raise ValueError("Patch contains no hunks")
+    return hunks
+
+@mcp.tool()
+def apply_patch(path: str, patch: str, expected_hash: Optional[str] = None) -> dict:
+    """
+    Apply a unified diff to a file in place.
     
-    return {
-        "path": path,
-        "files_count": len(files),
-        "dirs_count": len(dirs),
-        "files": files,
-        "directories": dirs
-    }
+    Hunks are matched on their context and removed lines (line endings are
+    ignored when matching), first at the line the hunk names and otherwise at
+    the nearest position where they match. Either every hunk applies and the
+    file is replaced atomically, or the file is left untouched.
+    
+    Args:
+        path: Path to file
+        patch: Unified diff for this file
+        expected_hash: SHA-256 of the file the patch was made against (see hash_files);
+            the patch is rejected if the file no longer matches
+        
+    Returns:
+        Dictionary with the path, new size and new hash, for chaining further edits
+    """
+    data = _read_for_edit(path, expected_hash)
+    try:
+        lines = _split_lines(data.decode("utf-8"))
+    except UnicodeDecodeError:
+        raise ValueError(f"File is not valid UTF-8 text: {path}")
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    
+    def matches_at(position, old_lines):
+        if position < 0 or position + len(old_lines) > len(lines):
+            return False
+        return all(lines[position + i].rstrip("\r\n") == old.rstrip("\r\n")
+                   for i, old in enumerate(old_lines))
+    
+    shift = 0
+    minimum = 0
+    for number, (old_start, old_lines, new_lines) in enumerate(_parse_unified_diff(patch), 1):
+        expected = max(old_start - 1, 0) + shift if old_lines else old_start + shift
+        position = None
+        for distance in range(len(lines) + 1):
+            for candidate in (expected - distance, expected + distance):
+                if candidate >= minimum and matches_at(candidate, old_lines):
+                    position = candidate
+                    break
+            if position is not None:
+                break
+        if position is None:
+            raise ValueError(f"Hunk {number} does not apply to {path}")
+        
+        new_block = [line.rstrip("\r\n") + newline if line.endswith("\n") else line for line in new_lines]
+        lines[position:position + len(old_lines)] = new_block
+        shift += len(new_block) - len(old_lines)
+        minimum = position + len(new_block)
+    
+    return _write_edit(path, "".join(lines).encode("utf-8"))
+
+@mcp.tool()
+def delete_file(path: str) -> bool:
+    """
+    Delete a file.
+    
+    Args:
+        path: Path to file
+        
+    Returns:
+        True if successful
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"File does not exist: {path}")
+    if not os.path.isfile(path):
+        raise ValueError(f"Path is not a file: {path}")
+    
+    os.remove(path)
+    _stat_cache.invalidate(path)
+    return True
+
+@mcp.tool()
+def create_directory(path: str) -> bool:
+    """
+    Create a directory.
+    
+    Args:
+        path: Path to new directory
+        
+    Returns:
+        True if successful
+    """
+    if os.path.exists(path):
+        raise ValueError(f"Path already exists: {path}")
+    
+    os.makedirs(path)
+    _stat_cache.invalidate(path)
+    return True
+
+class _JobCancelled(Exception):
+    """Raised inside a job when cancel_job has been called for it."""
+
+class _Job:
+    """
+    Progress and outcome of one long-running operation.
+    
+    Operations receive their _Job, call advance as files and bytes are done and
+    check_cancelled between units of work. Synchronous calls use an unregistered
+    _Job so the same code path serves both.
+    """
+    
+    def __init__(self, kind: str, arguments: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.arguments = arguments
+        self.owner = current_session_id()
+        self.status = "pending"
+        self.files_done = 0
+        self.bytes_done = 0
+        self.result = None
+        self.error = None
+        self.created_time = time.time()
+        self.started_time = None
+        self.finished_time = None
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+    
+    def advance(self, files: int = 0, bytes: int = 0) -> None:
+        with self.lock:
+            self.files_done += files
+            self.bytes_done += bytes
+    
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise _JobCancelled()
+    
+    def run(self, operation) -> None:
+        self.status = "running"
+        self.started_time = time.time()
+        try:
+            self.result = operation(self)
+            self.status = "completed"
+        except _JobCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+        finally:
+            self.finished_time = time.time()
+    
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "arguments": self.arguments,
+                "status": self.status,
+                "files_done": self.files_done,
+                "bytes_done": self.bytes_done,
+                "result": self.result,
+                "error": self.error,
+                "created_time": self.created_time,
+                "started_time": self.started_time,
+                "finished_time": self.finished_time
+            }
+
+def _start_job(kind: str, arguments: dict, operation) -> str:
+    """
+    Register a job and run it on the job pool.
+    
+    Args:
+        kind: Name of the operation, usually the tool name
+        arguments: Arguments the job was started with, for reporting
+        operation: Callable taking the _Job and returning the job's result
+        
+    Returns:
+        Job id to pass to get_job and cancel_job
+    """
+    job = _Job(kind, arguments)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        finished = [job_id for job_id, j in _jobs.items() if j.finished_time is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[job_id]
+    _job_pool.submit(job.run, operation)
+    return job.id
+
+def _get_job(job_id: str) -> _Job:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    # Jobs are only visible to the client session that started them
+    if job is None or job.owner != current_session_id():
+        raise ValueError(f"Unknown job id: {job_id}")
+    return job
+
+@mcp.tool()
+def get_job(job_id: str) -> dict:
+    """
+    Get the status and progress of a background job.
+    
+    Args:
+        job_id: Id returned by a tool called with background=True
+        
+    Returns:
+        Dictionary with the job's status (pending, running, completed, failed or
+        cancelled), files and bytes done so far, and its result or error
+    """
+    return _get_job(job_id).to_dict()
+
+@mcp.tool()
+def list_jobs() -> List[dict]:
+    """
+    List this session's running jobs and recently finished ones.
+    
+    Returns:
+        List of job dictionaries as returned by get_job, oldest first
+    """
+    owner = current_session_id()
+    with _jobs_lock:
+        jobs = [job for job in _jobs.values() if job.owner == owner]
+    return [job.to_dict() for job in jobs]
+
+@mcp.tool()
+def cancel_job(job_id: str) -> bool:
+    """
+    Ask a background job to stop. Work already done is not rolled back.
+    
+    Args:
+        job_id: Id of the job to cancel
+        
+    Returns:
+        True if cancellation was requested, False if the job had already finished
+    """
+    job = _get_job(job_id)
+    if job.finished_time is not None:
+        return False
+    job.cancel_event.set()
+    return True
+
+def _delete_tree(path: str, job: _Job) -> None:
+    """
+    Recursively delete a directory, reporting progress to job.
+    
+    Like shutil.rmtree, symlinks are never followed: a link inside the tree is
+    removed itself, and a directory that turns out to be a link is refused.
+    
+    Args:
+        path: Directory to delete
+        job: Job to report progress to and check for cancellation
+    """
+    # Directories still to empty, and directories already emptied (removed
+    # once everything above them on the stack is gone)
+    stack = [(path, False)]
+    try:
+        while stack:
+            directory, emptied = stack.pop()
+            if emptied:
+                os.rmdir(directory)
+                continue
+            if not stat.S_ISDIR(os.lstat(directory).st_mode):
+                raise OSError(f"Cannot delete a symbolic link as a directory tree: {directory}")
+            stack.append((directory, True))
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    job.check_cancelled()
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, False))
+                        continue
+                    size = entry.stat(follow_symlinks=False).st_size
+                    os.unlink(entry.path)
+                    job.advance(files=1, bytes=size)
+    finally:
+        _stat_cache.invalidate(path)
+
+@mcp.tool()
+def delete_directory(path: str, recursive: bool = False, background: bool = False) -> Union[bool, str]:
+    """
+    Delete a directory.
+    
+    Args:
+        path: Path to directory
+        recursive: If True, recursively delete directory and its contents
+        background: If True, run a recursive delete as a background job
+        
+    Returns:
+        True if successful, or the job id when background is True
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"Directory does not exist: {path}")
+    if not os.path.isdir(path):
+        raise ValueError(f"Path is not a directory: {path}")
+    if os.path.islink(path):
+        raise ValueError(f"Path is a symbolic link, not a directory: {path}")
+    
+    if recursive:
+        if background:
+            return _start_job("delete_directory", {"path": path}, lambda job: _delete_tree(path, job))
+        _delete_tree(path, _Job("delete_directory", {"path": path}))
+    else:
+        os.rmdir(path)
+        _stat_cache.invalidate(path)
+    return True
+
+@mcp.tool()
+def file_exists(path: str) -> bool:
+    """
+    Check if a file exists.
+    
+    Args:
+        path: Path to file
+        
+    Returns:
+        True if file exists, False otherwise
+    """
+    stat_info = _stat_cache.stat(path)
+    return stat_info is not None and stat.S_ISREG(stat_info.st_mode)
+
+@mcp.tool()
+def directory_exists(path: str) -> bool:
+    """
+    Check if a directory exists.
+    
+    Args:
+        path: Path to directory
+        
+    Returns:
+        True if directory exists, False otherwise
+    """
+    stat_info = _stat_cache.stat(path)
+    return stat_info is not None and stat.S_ISDIR(stat_info.st_mode)
+
+def _copy_file_data(source: str, destination: str) -> str:
+    """
+    Copy file contents using the cheapest mechanism the platform offers.
+    
+    Tries a reflink clone (FICLONE), then os.copy_file_range, then os.sendfile,
+    all of which keep the data in the kernel, before falling back to a buffered copy.
+    Like shutil.copyfile, a source or existing destination that is not a
+    regular file (a FIFO, say, which would block forever) raises SpecialFileError.
+    
+    Args:
+        source: Source file path
+        destination: Destination file path (created or truncated)
+        
+    Returns:
+        Name of the mechanism that performed the copy
+    """
+    # Opening the destination truncates it, so refuse (as shutil.copyfile does)
+    # when it is the source under another name
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise shutil.SameFileError(f"{source!r} and {destination!r} are the same file")
+    if os.path.exists(destination) and not stat.S_ISREG(os.stat(destination).st_mode):
+        raise shutil.SpecialFileError(f"{destination!r} is not a regular file")
+    # Opened non-blocking so that checking a FIFO source can't hang
+    with open(os.open(source, os.O_RDONLY | os.O_NONBLOCK), 'rb') as src:
+        if not stat.S_ISREG(os.fstat(src.fileno()).st_mode):
+            raise shutil.SpecialFileError(f"{source!r} is not a regular file")
+        with open(destination, 'wb') as dst:
+            return _copy_open_file(src, dst)
+
+def _copy_open_file(src, dst) -> str:
+    """
+    Copy between two open files for _copy_file_data.
+    
+    Args:
+        src: Source file, open for binary reading
+        dst: Destination file, open for binary writing
+        
+    Returns:
+        Name of the mechanism that performed the copy
+    """
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            pass
+    
+    size = os.fstat(src.fileno()).st_size
+    for name in ("copy_file_range", "sendfile"):
+        copy = getattr(os, name, None)
+        if copy is None:
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if name == "copy_file_range":
+                    sent = copy(src.fileno(), dst.fileno(), min(size - copied, COPY_CHUNK_BYTES))
+                else:
+                    sent = copy(dst.fileno(), src.fileno(), copied, min(size - copied, COPY_CHUNK_BYTES))
+                if sent == 0:
+                    break
+                copied += sent
+            return name
+        except OSError as e:
+            # Unsupported across these filesystems; try the next mechanism
+            if copied or e.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EBADF):
+                raise
+        src.seek(0)
+        dst.seek(0)
+    
+    shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+    return "buffered"
+
+@mcp.tool()
+def copy_file(source: str, destination: str) -> bool:
+    """
+    Copy a file from source to destination.
+    
+    Data is copied inside the kernel (reflink, copy_file_range or sendfile)
+    where possible; metadata is preserved as with shutil.copy2.
+    
+    Args:
+        source: Source file path
+        destination: Destination file path
+        
+    Returns:
+        True if successful
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Source file does not exist: {source}")
+    if not os.path.isfile(source):
+        raise ValueError(f"Source path is not a file: {source}")
+    
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    _copy_file_data(source, destination)
+    shutil.copystat(source, destination)
+    _stat_cache.invalidate(destination)
+    return True
+
+def _copy_tree(source: str, destination: str, job: _Job) -> dict:
+    """
+    Copy a directory tree on the copy pool, reporting progress to job.
+    
+    Args:
+        source: Source directory path
+        destination: Destination directory path
+        job: Job to report progress to and check for cancellation
+        
+    Returns:
+        Dictionary with the copy statistics returned by copy_tree
+    """
+    started = time.monotonic()
+    totals = {"files": 0, "bytes": 0}
+    errors = []
+    totals_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(COPY_WORKERS * 4)
+    
+    def copy_one(src, dst):
+        try:
+            if job.cancel_event.is_set():
+                return
+            _copy_file_data(src, dst)
+            shutil.copystat(src, dst)
+            size = os.path.getsize(dst)
+            with totals_lock:
+                totals["files"] += 1
+                totals["bytes"] += size
+            job.advance(files=1, bytes=size)
+        except OSError as e:
+            with totals_lock:
+                errors.append({"path": src, "error": str(e)})
+        finally:
+            slots.release()
+    
+    directories = []
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS, thread_name_prefix="fs-copy") as executor:
+        for dirpath, dirnames, filenames in os.walk(source):
+            job.check_cancelled()
+            target_dir = os.path.join(destination, os.path.relpath(dirpath, source))
+            os.makedirs(target_dir, exist_ok=True)
+            directories.append((dirpath, target_dir))
+            for name in dirnames + filenames:
+                src = os.path.join(dirpath, name)
+                dst = os.path.join(target_dir, name)
+                if os.path.islink(src):
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    os.symlink(os.readlink(src), dst)
+                    if name in dirnames:
+                        dirnames.remove(name)
+                elif name in filenames:
+                    slots.acquire()
+                    executor.submit(copy_one, src, dst)
+    
+    job.check_cancelled()
+    # Directory times are set last, once nothing more is written into them
+    for dirpath, target_dir in reversed(directories):
+        shutil.copystat(dirpath, target_dir)
+    _stat_cache.invalidate(destination)
+    
+    elapsed = time.monotonic() - started
+    return {
+        "source": source,
+        "destination": destination,
+        "files": totals["files"],
+        "bytes": totals["bytes"],
+        "seconds": elapsed,
+        "bytes_per_second": totals["bytes"] / elapsed if elapsed > 0 else 0.0,
+        "errors": errors
+    }
+
+@mcp.tool()
+def copy_tree(source: str, destination: str, dirs_exist_ok: bool = False,
+              background: bool = False) -> Union[dict, str]:
+    """
+    Copy a directory tree from source to destination.
+    
+    Directories are created as the tree is walked while file copies run on a
+    bounded pool of COPY_WORKERS threads, each using the same in-kernel copy as
+    copy_file. Symlinks are recreated rather than followed.
+    
+    Args:
+        source: Source directory path
+        destination: Destination directory path
+        dirs_exist_ok: Allow copying into directories that already exist
+        background: If True, run the copy as a background job
+        
+    Returns:
+        Dictionary with the number of files and bytes copied, elapsed seconds,
+        bytes per second and any per-file errors, or the job id when background is True
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Source directory does not exist: {source}")
+    if not os.path.isdir(source):
+        raise ValueError(f"Source path is not a directory: {source}")
+    if os.path.exists(destination) and not dirs_exist_ok:
+        raise ValueError(f"Destination already exists: {destination}")
+    
+    arguments = {"source": source, "destination": destination}
+    if background:
+        return _start_job("copy_tree", arguments, lambda job: _copy_tree(source, destination, job))
+    return _copy_tree(source, destination, _Job("copy_tree", arguments))
+
+def _move_file(source: str, destination: str, job: _Job) -> None:
+    """
+    Move a file, renaming it when possible and copying then deleting it across devices.
+    
+    Args:
+        source: Source file path
+        destination: Destination file path or directory
+        job: Job to report progress to and check for cancellation
+    """
+    if os.path.isdir(destination):
+        destination = os.path.join(destination, os.path.basename(source))
+    size = os.path.getsize(source)
+    try:
+        try:
+            os.rename(source, destination)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            _copy_file_data(source, destination)
+            shutil.copystat(source, destination)
+            if job.cancel_event.is_set():
+                os.remove(destination)
+                job.check_cancelled()
+            os.remove(source)
+        job.advance(files=1, bytes=size)
+    finally:
+        _stat_cache.invalidate(source)
+        _stat_cache.invalidate(destination)
+
+@mcp.tool()
+def move_file(source: str, destination: str, background: bool = False) -> Union[bool, str]:
+    """
+    Move a file from source to destination.
+    
+    Args:
+        source: Source file path
+        destination: Destination file path
+        background: If True, run the move as a background job; useful when a
+            move across devices has to copy the data
+        
+    Returns:
+        True if successful, or the job id when background is True
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Source file does not exist: {source}")
+    if not os.path.isfile(source):
+        raise ValueError(f"Source path is not a file: {source}")
+    
+    arguments = {"source": source, "destination": destination}
+    if background:
+        return _start_job("move_file", arguments, lambda job: _move_file(source, destination, job))
+    _move_file(source, destination, _Job("move_file", arguments))
+    return True
+
+@mcp.tool()
+def get_file_size(path: str) -> int:
+    """
+    Get the size of a file in bytes.
+    
+    Args:
+        path: Path to file
+        
+    Returns:
+        Size of the file in bytes
+    """
+    stat_info = _stat_cache.stat(path)
+    if stat_info is None:
+        raise ValueError(f"File does not exist: {path}")
+    if not stat.S_ISREG(stat_info.st_mode):
+        raise ValueError(f"Path is not a file: {path}")
+    
+    return stat_info.st_size
+
+@mcp.resource("file://{path}")
+def get_file_info(path: str) -> dict:
+    """
+    Get information about a file.
+    
+    Args:
+        path: Path to file
+        
+    Returns:
+        Dictionary with file information
+    """
+    stat_info = _stat_cache.stat(path)
+    if stat_info is None:
+        raise ValueError(f"Path does not exist: {path}")
+    
+    return {
+        "path": path,
+        "size": stat_info.st_size,
+        "is_file": stat.S_ISREG(stat_info.st_mode),
+        "is_dir": stat.S_ISDIR(stat_info.st_mode),
+        "modified_time": stat_info.st_mtime,
+        "created_time": stat_info.st_ctime,
+        "accessed_time": stat_info.st_atime
+    }
+
+def _run_batch(fn, paths: List[str]) -> List[dict]:
+    """
+    Apply a single-path function to many paths on the batch thread pool.
+    
+    Args:
+        fn: Function taking one path
+        paths: Paths to apply it to
+        
+    Returns:
+        One dictionary per path, in order, with either a result or an error
+    """
+    if len(paths) > MAX_BATCH_PATHS:
+        raise ValueError(f"Too many paths in one batch: {len(paths)} (limit {MAX_BATCH_PATHS})")
+    
+    def call(path):
+        try:
+            return {"path": path, "result": fn(path)}
+        except Exception as e:
+            return {"path": path, "error": str(e)}
+    
+    return list(_batch_pool.map(call, paths))
+
+@mcp.tool()
+def files_exist(paths: List[str]) -> List[dict]:
+    """
+    Check whether each of several paths is an existing file.
+    
+    Args:
+        paths: Paths to check
+        
+    Returns:
+        List of {"path", "result"} dictionaries, in the order of paths
+    """
+    return _run_batch(file_exists, paths)
+
+@mcp.tool()
+def directories_exist(paths: List[str]) -> List[dict]:
+    """
+    Check whether each of several paths is an existing directory.
+    
+    Args:
+        paths: Paths to check
+        
+    Returns:
+        List of {"path", "result"} dictionaries, in the order of paths
+    """
+    return _run_batch(directory_exists, paths)
+
+@mcp.tool()
+def get_file_sizes(paths: List[str]) -> List[dict]:
+    """
+    Get the size of several files in bytes.
+    
+    Args:
+        paths: Paths to files
+        
+    Returns:
+        List of {"path", "result"} dictionaries, in the order of paths, with
+        {"path", "error"} in place of a result for paths that failed
+    """
+    return _run_batch(get_file_size, paths)
+
+@mcp.tool()
+def get_files_info(paths: List[str]) -> List[dict]:
+    """
+    Get information about several files or directories.
+    
+    Args:
+        paths: Paths to describe
+        
+    Returns:
+        List of {"path", "result"} dictionaries, in the order of paths, where each
+        result is what the file:// resource returns; failed paths carry an error instead
+    """
+    return _run_batch(get_file_info, paths)
+
+@mcp.tool()
+def read_files(paths: List[str], offset: int = 0, length: Optional[int] = None) -> List[dict]:
+    """
+    Read several files, or the same byte range of each of them.
+    
+    Each file is read like a ranged read_file call, so at most length bytes
+    (MAX_READ_BYTES by default) come back per file; use its next_offset with
+    read_file to continue a file that was cut short. The whole batch returns
+    at most MAX_BATCH_READ_BYTES: files are granted what is left of that
+    budget as they are read, so a file may come back shorter than length, and
+    files read once it is spent carry an error instead.
+    
+    Args:
+        paths: Paths to files
+        offset: Byte offset to start reading each file from
+        length: Maximum number of bytes to return per file (defaults to MAX_READ_BYTES)
+        
+    Returns:
+        List of {"path", "result"} dictionaries, in the order of paths, where each
+        result is what a ranged read_file returns; failed paths carry an error instead
+    """
+    if length is not None and length <= 0:
+        raise ValueError(f"Length must be positive: {length}")
+    wanted = MAX_READ_BYTES if length is None else length
+    # Bytes of the budget not yet granted; a read's unused grant is handed back
+    budget = [MAX_BATCH_READ_BYTES]
+    budget_lock = threading.Lock()
+    
+    def read_one(path):
+        with budget_lock:
+            grant = min(wanted, budget[0])
+            budget[0] -= grant
+        if grant <= 0:
+            raise ValueError(f"Batch read limit of {MAX_BATCH_READ_BYTES} bytes reached; read this file separately")
+        used = 0
+        try:
+            result = read_file(path, offset=offset, length=grant)
+            used = result["next_offset"] - result["offset"]
+            return result
+        finally:
+            with budget_lock:
+                budget[0] += grant - used
+    
+    return _run_batch(read_one, paths)
+
+@mcp.resource("dir://{path}")
+@memoize(path_args=("path",))
+def get_directory_info(path: str) -> dict:
+    """
+    Get information about a directory.
+    
+    Args:
+        path: Path to directory
+        
+    Returns:
+        Dictionary with directory information
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"Path does not exist: {path}")
+    if not os.path.isdir(path):
+        raise ValueError(f"Path is not a directory: {path}")
+    
+    files = []
+    dirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            # DirEntry answers from the scandir type info; only symlinks need a stat
+            if entry.is_file():
+                files.append(entry.name)
+            elif entry.is_dir():
+                dirs.append(entry.name)
+    
+    return {
+        "path": path,
+        "files_count": len(files),
+        "dirs_count": len(dirs),
+        "files": files,
+        "directories": dirs
+    }
+
+def _scan_directory(path: str) -> tuple:
+    """
+    Scan one directory without following symlinks.
+    
+    Args:
+        path: Path to directory
+        
+    Returns:
+        Tuple of (files, subdirectories) where files is a list of (path, size)
+        pairs and subdirectories a list of paths; unreadable directories scan as empty
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+@mcp.tool()
+def get_directory_summary(path: str, max_depth: Optional[int] = None, top_n: int = 10) -> dict:
+    """
+    Summarise a directory tree: total bytes, file counts per depth and the largest files.
+    
+    The tree is walked level by level, with each level's directories scanned
+    in parallel on a bounded thread pool. Symlinks are not followed.
+    
+    Args:
+        path: Path to directory
+        max_depth: Deepest level to descend to (0 is the directory itself); unlimited if None
+        top_n: Number of largest files to report
+        
+    Returns:
+        Dictionary with total bytes, file and directory counts, files per depth
+        and the largest files
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"Path does not exist: {path}")
+    if not os.path.isdir(path):
+        raise ValueError(f"Path is not a directory: {path}")
+    if max_depth is not None and max_depth < 0:
+        raise ValueError(f"Max depth must be non-negative: {max_depth}")
+    
+    total_bytes = 0
+    dirs_count = 0
+    files_per_depth = []
+    largest = []
+    
+    level = [path]
+    depth = 0
+    with ThreadPoolExecutor(max_workers=WALK_WORKERS) as executor:
+        while level:
+            next_level = []
+            files_at_depth = 0
+            for files, subdirs in executor.map(_scan_directory, level):
+                files_at_depth += len(files)
+                for file_path, size in files:
+                    total_bytes += size
+                    if len(largest) < top_n:
+                        heapq.heappush(largest, (size, file_path))
+                    elif top_n > 0 and size > largest[0][0]:
+                        heapq.heapreplace(largest, (size, file_path))
+                dirs_count += len(subdirs)
+                next_level.extend(subdirs)
+            files_per_depth.append(files_at_depth)
+            if max_depth is not None and depth >= max_depth:
+                break
+            level = next_level
+            depth += 1
+    
+    return {
+        "path": path,
+        "total_bytes": total_bytes,
+        "files_count": sum(files_per_depth),
+        "dirs_count": dirs_count,
+        "files_per_depth": files_per_depth,
+        "largest_files": [{"path": file_path, "size": size} for size, file_path in sorted(largest, reverse=True)]
+    }
+
+@mcp.resource("dir-summary://{path}")
+def get_directory_summary_info(path: str) -> dict:
+    """
+    Get a recursive summary of a directory tree.
+    
+    Args:
+        path: Path to directory
+        
+    Returns:
+        Dictionary with the summary produced by get_directory_summary
+    """
+    return get_directory_summary(path)
+
+class _DiskUsageCache:
+    """
+    Per-directory usage remembered between disk_usage calls.
+    
+    Each entry holds what a single scandir of one directory found: the bytes
+    and count of its files, its largest files and the names of its
+    subdirectories. An entry is reused while the directory's device, inode and
+    mtime are unchanged, so a repeated query only rescans directories whose
+    entries were added, removed or renamed. A file growing in place doesn't
+    touch its directory's mtime, so entries also expire after a TTL. The
+    cache is bounded by the items its entries hold rather than by their
+    number, since one entry can keep up to MAX_DISK_USAGE_TOP files.
+    """
+    
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.items = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def scan(self, directory: str) -> Optional[tuple]:
+        """
+        Get the usage of one directory's own files, scanning it only if it changed.
+    
+        Args:
+            directory: Directory path
+    
+        Returns:
+            Tuple of (signature, scanned time, bytes on disk, apparent bytes,
+            file count, subdirectory names, largest files as (bytes on disk,
+            apparent size, name) tuples, hard-linked files as (device, inode,
+            bytes on disk, apparent size) tuples), or None if the directory
+            can't be read; hard-linked files are left out of the totals so
+            disk_usage can count each inode once
+        """
+        try:
+            stat_info = os.lstat(directory)
+        except OSError:
+            return None
+        # Taken before scanning, so a change during the scan forces a rescan next time
+        signature = (stat_info.st_dev, stat_info.st_ino, stat_info.st_mtime_ns)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(directory)
+            if entry is not None and entry[0] == signature and now - entry[1] < self.ttl:
+                self.entries.move_to_end(directory)
+                self.hits += 1
+                return entry
+            self.misses += 1
+    
+        # The directory's own blocks count too, as they do for du
+        disk_bytes = stat_info.st_blocks * 512 if hasattr(stat_info, "st_blocks") else 0
+        apparent_bytes = 0
+        files = 0
+        subdirs = []
+        largest = []
+        linked = []
+        try:
+            with os.scandir(directory) as entries:
+                for dir_entry in entries:
+                    try:
+                        if dir_entry.is_dir(follow_symlinks=False):
+                            subdirs.append(dir_entry.name)
+                            continue
+                        entry_stat = dir_entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    allocated = getattr(entry_stat, "st_blocks", None)
+                    allocated = entry_stat.st_size if allocated is None else allocated * 512
+                    if entry_stat.st_nlink > 1:
+                        linked.append((entry_stat.st_dev, entry_stat.st_ino, allocated, entry_stat.st_size))
+                    else:
+                        disk_bytes += allocated
+                        apparent_bytes += entry_stat.st_size
+                        files += 1
+                    item = (allocated, entry_stat.st_size, dir_entry.name)
+                    if len(largest) < MAX_DISK_USAGE_TOP:
+                        heapq.heappush(largest, item)
+                    elif item > largest[0]:
+                        heapq.heapreplace(largest, item)
+        except OSError:
+            return None
+    
+        entry = (signature, now, disk_bytes, apparent_bytes, files, tuple(subdirs), tuple(largest), tuple(linked))
+        with self.lock:
+            previous = self.entries.pop(directory, None)
+            if previous is not None:
+                self.items -= self._size(previous)
+            self.entries[directory] = entry
+            self.items += self._size(entry)
+            while self.items > self.max_items and self.entries:
+                self.items -= self._size(self.entries.popitem(last=False)[1])
+        return entry
+    
+    @staticmethod
+    def _size(entry: tuple) -> int:
+        """Items an entry holds: itself plus its subdirectory names, largest files and hard links."""
+        return 1 + len(entry[5]) + len(entry[6]) + len(entry[7])
+    
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "items": self.items,
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+_disk_usage_cache = _DiskUsageCache(DISK_USAGE_CACHE_ITEMS, DISK_USAGE_CACHE_TTL)
+
+@mcp.tool()
+def disk_usage(path: str, top_n: int = 10, one_filesystem: bool = False) -> dict:
+    """
+    Find where space is going under a directory, like du.
+    
+    The tree is walked level by level with each level's directories scanned
+    in parallel on WALK_WORKERS threads. Per-directory results are cached and
+    reused while the directory's mtime is unchanged (for up to
+    DISK_USAGE_CACHE_TTL seconds), so repeated queries only rescan directories
+    that changed. Symlinks are not followed, and a hard-linked file is counted
+    once, in the shallowest directory that links it.
+    
+    Args:
+        path: Directory to measure
+        top_n: Number of largest subtrees and files to report (at most MAX_DISK_USAGE_TOP)
+        one_filesystem: Skip directories on other filesystems, like du -x
+    
+    Returns:
+        Dictionary with the bytes on disk, apparent bytes, file and directory
+        counts of the whole tree, its largest subtrees and largest files, and
+        how many directories were rescanned versus served from the cache
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"Path does not exist: {path}")
+    if not os.path.isdir(path):
+        raise ValueError(f"Path is not a directory: {path}")
+    if not 0 <= top_n <= MAX_DISK_USAGE_TOP:
+        raise ValueError(f"top_n must be between 0 and {MAX_DISK_USAGE_TOP}: {top_n}")
+    
+    started = time.monotonic()
+    root = os.path.abspath(path)
+    root_device = None
+    usage = {}
+    order = []
+    largest_files = []
+    # Hard-linked inodes already counted, and the totals they add per directory
+    seen_inodes = set()
+    linked_totals = {}
+    
+    level = [root]
+    with ThreadPoolExecutor(max_workers=WALK_WORKERS) as executor:
+        while level:
+            next_level = []
+            for directory, entry in zip(level, executor.map(_disk_usage_cache.scan, level)):
+                if entry is None:
+                    continue
+                if root_device is None:
+                    root_device = entry[0][0]
+                elif one_filesystem and entry[0][0] != root_device:
+                    continue
+                usage[directory] = entry
+                order.append(directory)
+                for device, inode, allocated, size in entry[7]:
+                    if (device, inode) not in seen_inodes:
+                        seen_inodes.add((device, inode))
+                        extra = linked_totals.get(directory, (0, 0, 0))
+                        linked_totals[directory] = (extra[0] + allocated, extra[1] + size, extra[2] + 1)
+                for item in entry[6]:
+                    if len(largest_files) < top_n:
+                        heapq.heappush(largest_files, (item, directory))
+                    elif top_n > 0 and item > largest_files[0][0]:
+                        heapq.heapreplace(largest_files, (item, directory))
+                next_level.extend(os.path.join(directory, name) for name in entry[5])
+            level = next_level
+    
+    # Children come after their parents in order, so summing in reverse visits
+    # every subtree before the directory containing it
+    totals = {}
+    for directory in reversed(order):
+        entry = usage[directory]
+        extra = linked_totals.get(directory, (0, 0, 0))
+        disk_bytes, apparent_bytes, files, dirs = entry[2] + extra[0], entry[3] + extra[1], entry[4] + extra[2], 0
+        for name in entry[5]:
+            child = totals.get(os.path.join(directory, name))
+            if child is not None:
+                disk_bytes += child[0]
+                apparent_bytes += child[1]
+                files += child[2]
+                dirs += child[3] + 1
+        totals[directory] = (disk_bytes, apparent_bytes, files, dirs)
+    
+    if root not in totals:
+        raise ValueError(f"Directory cannot be read: {path}")
+    subtrees = heapq.nlargest(top_n, ((total, directory) for directory, total in totals.items()
+                                      if directory != root))
+    disk_bytes, apparent_bytes, files, dirs = totals[root]
+    rescanned = sum(1 for directory in order if usage[directory][1] >= started)
+    return {
+        "path": path,
+        "bytes": disk_bytes,
+        "apparent_bytes": apparent_bytes,
+        "files_count": files,
+        "dirs_count": dirs,
+        "largest_subtrees": [{"path": directory, "bytes": total[0], "apparent_bytes": total[1],
+                              "files_count": total[2]} for total, directory in subtrees],
+        "largest_files": [{"path": os.path.join(directory, item[2]), "bytes": item[0], "size": item[1]}
+                          for item, directory in sorted(largest_files, reverse=True)],
+        "dirs_rescanned": rescanned,
+        "dirs_cached": len(order) - rescanned,
+        "seconds": time.monotonic() - started
+    }
+
+def _stat_entry(path: str) -> Optional[tuple]:
+    """
+    Describe a path without following symlinks.
+    
+    Args:
+        path: Path to describe
+        
+    Returns:
+        Tuple of (type, size, mtime), or None if the path no longer exists
+    """
+    try:
+        stat_info = os.lstat(path)
+    except OSError:
+        return None
+    if stat.S_ISLNK(stat_info.st_mode):
+        kind = "symlink"
+    elif stat.S_ISDIR(stat_info.st_mode):
+        kind = "dir"
+    elif stat.S_ISREG(stat_info.st_mode):
+        kind = "file"
+    else:
+        kind = "other"
+    return kind, stat_info.st_size, stat_info.st_mtime
+
+class _PathIndex:
+    """
+    In-memory index of every path under a root.
+    
+    The tree is walked on the first refresh; afterwards the index is kept
+    current from inotify events, or, where inotify is unavailable or out of
+    watches, by rescanning only the directories whose mtime has changed. All
+    of it happens under the index's own lock, so building one root's index
+    never holds up queries against another.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dir_mtimes = {}
+        self.watcher = None
+        self.built = False
+    
+    def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+    
+    def _watch(self, directory: str) -> None:
+        if self.watcher is None:
+            return
+        try:
+            self.watcher.add_watch(directory)
+        except OSError:
+            # Typically out of inotify watches; fall back to mtime polling
+            self.close()
+    
+    def _add_tree(self, top: str) -> None:
+        info = _stat_entry(top)
+        if info is None:
+            return
+        self.entries[top] = info
+        if info[0] != "dir":
+            return
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            self._watch(directory)
+            try:
+                self.dir_mtimes[directory] = os.stat(directory).st_mtime
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        info = _stat_entry(entry.path)
+                        if info is None:
+                            continue
+                        self.entries[entry.path] = info
+                        if info[0] == "dir":
+                            stack.append(entry.path)
+            except OSError:
+                continue
+    
+    def _remove_tree(self, top: str) -> None:
+        info = self.entries.pop(top, None)
+        if info is None or info[0] != "dir":
+            return
+        prefix = top + os.sep
+        for path in [p for p in self.entries if p.startswith(prefix)]:
+            del self.entries[path]
+        for path in [p for p in self.dir_mtimes if p == top or p.startswith(prefix)]:
+            del self.dir_mtimes[path]
+        if self.watcher is not None:
+            self.watcher.remove_tree(top)
+    
+    def _rebuild(self) -> None:
+        self.close()
+        self.entries = {}
+        self.dir_mtimes = {}
+        self.watcher = _open_inotify(_WATCH_MASK)
+        self._add_tree(self.root)
+    
+    def refresh(self) -> None:
+        """Bring the index up to date with the filesystem, building it on first use."""
+        if not self.built:
+            self._rebuild()
+            self.built = True
+        elif self.watcher is not None:
+            self._apply_events()
+        else:
+            self._poll()
+    
+    def _apply_events(self) -> None:
+        changed = set()
+        for mask, _, path in self.watcher.read_events():
+            if path is None or mask & IN_Q_OVERFLOW:
+                self._rebuild()
+                return
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF) and path == self.root:
+                self._rebuild()
+                return
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._remove_tree(path)
+                changed.discard(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR:
+                self._add_tree(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE):
+                changed.add(path)
+        for path in changed:
+            info = _stat_entry(path)
+            if info is None:
+                self.entries.pop(path, None)
+            else:
+                self.entries[path] = info
+    
+    def _poll(self) -> None:
+        for directory, mtime in list(self.dir_mtimes.items()):
+            if directory not in self.dir_mtimes:
+                continue
+            try:
+                current = os.stat(directory).st_mtime
+            except OSError:
+                self._remove_tree(directory)
+                continue
+            if current == mtime:
+                continue
+            self.dir_mtimes[directory] = current
+            prefix = directory + os.sep
+            known = {p for p in self.entries
+                     if p.startswith(prefix) and os.sep not in p[len(prefix):]}
+            try:
+                present = {entry.path for entry in os.scandir(directory)}
+            except OSError:
+                continue
+            for path in known - present:
+                self._remove_tree(path)
+            for path in present - known:
+                self._add_tree(path)
+        if self.root not in self.entries and os.path.isdir(self.root):
+            self._rebuild()
+
+def _get_path_index(root: str) -> _PathIndex:
+    """
+    Get the index for a root, registering an empty one on first use.
+    
+    The global lock only guards the registry; the tree is walked later by
+    refresh() under the index's own lock.
+    
+    Args:
+        root: Absolute, normalised root directory
+        
+    Returns:
+        The root's _PathIndex; call refresh() under its lock before querying it
+    """
+    evicted = []
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _PathIndex(root)
+            _indexes[root] = index
+            while len(_indexes) > MAX_PATH_INDEXES:
+                evicted.append(_indexes.popitem(last=False)[1])
+        else:
+            _indexes.move_to_end(root)
+    for old in evicted:
+        with old.lock:
+            old.close()
+    return index
+
+@mcp.tool()
+def find_files(root: str, pattern: Optional[str] = None, regex: Optional[str] = None,
+               extension: Optional[str] = None, min_size: Optional[int] = None,
+               max_size: Optional[int] = None, modified_after: Optional[float] = None,
+               modified_before: Optional[float] = None, entry_type: Optional[str] = None,
+               max_results: int = 1000) -> dict:
+    """
+    Find paths under a directory tree.
+    
+    The first call for a root walks the tree and keeps an in-memory index of
+    it; later calls are answered from the index, which is updated incrementally
+    from inotify (or directory mtimes where inotify is unavailable).
+    
+    Args:
+        root: Directory to search under
+        pattern: Glob matched against the file name
+        regex: Regular expression searched for in the path relative to root
+        extension: File extension to match, with or without the leading dot
+        min_size: Minimum size in bytes
+        max_size: Maximum size in bytes
+        modified_after: Only paths modified after this Unix timestamp
+        modified_before: Only paths modified before this Unix timestamp
+        entry_type: Only paths of this type ("file", "dir", "symlink" or "other")
+        max_results: Maximum number of matches to return
+        
+    Returns:
+        Dictionary with the matches (path, type, size, modified_time) and
+        whether the result was truncated at max_results
+    """
+    if not os.path.exists(root):
+        raise ValueError(f"Path does not exist: {root}")
+    if not os.path.isdir(root):
+        raise ValueError(f"Path is not a directory: {root}")
+    if entry_type is not None and entry_type not in ENTRY_TYPES:
+        raise ValueError(f"Unknown entry type: {entry_type}")
+    try:
+        compiled = re.compile(regex) if regex is not None else None
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}")
+    if extension is not None and not extension.startswith("."):
+        extension = "." + extension
+    
+    root = os.path.normpath(os.path.abspath(root))
+    index = _get_path_index(root)
+    prefix_length = len(root) + 1
+    
+    matches = []
+    truncated = False
+    with index.lock:
+        index.refresh()
+        for path, (kind, size, mtime) in index.entries.items():
+            if path == root:
+                continue
+            if entry_type is not None and kind != entry_type:
+                continue
+            if min_size is not None and size < min_size:
+                continue
+            if max_size is not None and size > max_size:
+                continue
+            if modified_after is not None and mtime <= modified_after:
+                continue
+            if modified_before is not None and mtime >= modified_before:
+                continue
+            name = os.path.basename(path)
+            if extension is not None and os.path.splitext(name)[1] != extension:
+                continue
+            if pattern is not None and not fnmatch.fnmatch(name, pattern):
+                continue
+            if compiled is not None and not compiled.search(path[prefix_length:]):
+                continue
+            if len(matches) >= max_results:
+                truncated = True
+                break
+            matches.append({"path": path, "type": kind, "size": size, "modified_time": mtime})
+    
+    return {"root": root, "matches": matches, "truncated": truncated}
+
+def _walk_order(path: str) -> tuple:
+    """
+    Sort key matching the order _walk_files yields paths in.
+    
+    Args:
+        path: File path relative to the walk root
+        
+    Returns:
+        Key where files sort before the contents of sibling directories
+    """
+    parts = path.split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+def _walk_files(root: str, pattern: Optional[str]):
+    """
+    Yield files under root in a stable order: each directory's files by name,
+    then its subdirectories by name. Symlinked directories are not followed,
+    and only regular files (or links to them) are yielded, so FIFOs, sockets
+    and devices never reach a reader that would block on them.
+    
+    Args:
+        root: Directory to walk
+        pattern: Only yield files whose name matches this glob
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file() and (pattern is None or fnmatch.fnmatch(entry.name, pattern)):
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        for name in sorted(files):
+            yield os.path.join(directory, name)
+        stack.extend(os.path.join(directory, name) for name in sorted(subdirs, reverse=True))
+
+def _get_grep_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool used by grep_files, starting it on first use.
+    
+    Returns:
+        The shared ProcessPoolExecutor
+    """
+    global _grep_pool
+    with _grep_pool_lock:
+        if _grep_pool is None:
+            # Workers come from a fork server rather than forking this process,
+            # whose tool threads may hold locks a forked child would inherit.
+            # They only need grep_worker, which the fork server loads up front
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["grep_worker"])
+            _grep_pool = ProcessPoolExecutor(max_workers=GREP_WORKERS, mp_context=context)
+        return _grep_pool
+
+def _grep_batch(batch: List[str], pattern: bytes, flags: int, context_lines: int,
+                skips: List[int], limit: int) -> List[tuple]:
+    """
+    Search a batch of files on the grep pool.
+    
+    If a worker process dies, the broken pool is discarded and the batch is
+    retried on a fresh one; if that breaks too, the batch is searched in
+    this process instead.
+    
+    Args:
+        batch: Paths to search
+        pattern: Regular expression as bytes
+        flags: re flags for the pattern
+        context_lines: Number of lines of context before and after each match
+        skips: Matching lines to skip in each file
+        limit: Maximum number of matching lines to return per file
+        
+    Returns:
+        grep_file's (matches, more) result for each path, in order
+    """
+    global _grep_pool
+    arguments = (batch, itertools.repeat(pattern), itertools.repeat(flags),
+                 itertools.repeat(context_lines), skips, itertools.repeat(limit))
+    for _ in range(2):
+        pool = _get_grep_pool()
+        try:
+            return list(pool.map(grep_file, *arguments, chunksize=max(1, len(batch) // (GREP_WORKERS * 4))))
+        except BrokenProcessPool:
+            with _grep_pool_lock:
+                if _grep_pool is pool:
+                    _grep_pool = None
+            pool.shutdown(wait=False)
+    return list(map(grep_file, *arguments))
+
+@mcp.tool()
+def grep_files(root: str, pattern: str, glob: Optional[str] = None, ignore_case: bool = False,
+               fixed_string: bool = False, context_lines: int = 0, max_results: int = 100,
+               cursor: Optional[str] = None) -> dict:
+    """
+    Search the contents of files under a directory tree.
+    
+    Files are scanned memory-mapped on a pool of worker processes; binary files
+    (those with a NUL byte near the start) are skipped. Only matching lines and
+    their context are returned.
+    
+    Args:
+        root: Directory to search under
+        pattern: Regular expression to search for, matched per line
+        glob: Only search files whose name matches this glob
+        ignore_case: Match case-insensitively
+        fixed_string: Treat pattern as a literal string rather than a regex
+        context_lines: Number of lines of context before and after each match
+        max_results: Maximum number of matching lines to return
+        cursor: next_cursor from a previous call, to continue the search
+        
+    Returns:
+        Dictionary with the matches (path, line_number, line, before, after),
+        the number of files searched and next_cursor (None when the search is complete)
+    """
+    if not os.path.exists(root):
+        raise ValueError(f"Path does not exist: {root}")
+    if not os.path.isdir(root):
+        raise ValueError(f"Path is not a directory: {root}")
+    if max_results <= 0:
+        raise ValueError(f"Max results must be positive: {max_results}")
+    if context_lines < 0:
+        raise ValueError(f"Context lines must be non-negative: {context_lines}")
+    
+    pattern_bytes = (re.escape(pattern) if fixed_string else pattern).encode("utf-8")
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    try:
+        re.compile(pattern_bytes, flags)
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}")
+    
+    resume_path = None
+    resume_skip = 0
+    if cursor is not None:
+        resume_path, resume_skip = _decode_cursor(cursor)
+        resume_key = _walk_order(resume_path)
+    
+    files = _walk_files(root, glob)
+    if resume_path is not None:
+        files = (path for path in files if _walk_order(os.path.relpath(path, root)) >= resume_key)
+    
+    matches = []
+    files_searched = 0
+    next_cursor = None
+    while next_cursor is None:
+        batch = list(itertools.islice(files, GREP_BATCH_SIZE))
+        if not batch:
+            break
+        remaining = max_results - len(matches)
+        skips = [resume_skip if os.path.relpath(path, root) == resume_path else 0 for path in batch]
+        results = _grep_batch(batch, pattern_bytes, flags, context_lines, skips, remaining)
+        for position, (path, skip, (found, more)) in enumerate(zip(batch, skips, results)):
+            files_searched += 1
+            taken = found[:max_results - len(matches)]
+            matches.extend(taken)
+            if len(matches) < max_results:
+                continue
+            if more or len(taken) < len(found):
+                next_cursor = _encode_cursor([os.path.relpath(path, root), skip + len(taken)])
+            else:
+                # This file is exhausted; resume from the file after it, if any
+                following = batch[position + 1] if position + 1 < len(batch) else next(files, None)
+                if following is not None:
+                    next_cursor = _encode_cursor([os.path.relpath(following, root), 0])
+            break
+        if len(matches) >= max_results:
+            break
+    
+    return {"root": root, "matches": matches, "files_searched": files_searched, "next_cursor": next_cursor}
+
+class _DigestCache:
+    """
+    On-disk cache of file digests in SQLite.
+    
+    Rows are keyed by (device, inode, algorithm) and hold the mtime and size
+    the digest was computed at; a row only counts as a hit while both still
+    match, and rehashing a changed file overwrites its row.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS digests ("
+                "device INTEGER, inode INTEGER, algorithm TEXT, mtime_ns INTEGER, size INTEGER, "
+                "digest TEXT, PRIMARY KEY (device, inode, algorithm))"
+            )
+        return self.connection
+    
+    def lookup(self, stat_info: os.stat_result, algorithm: str) -> Optional[str]:
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT digest FROM digests WHERE device = ? AND inode = ? AND algorithm = ? "
+                "AND mtime_ns = ? AND size = ?",
+                (stat_info.st_dev, stat_info.st_ino, algorithm, stat_info.st_mtime_ns, stat_info.st_size)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+    
+    def store(self, rows: List[tuple]) -> None:
+        """
+        Save digests.
+        
+        Args:
+            rows: (stat_result, algorithm, digest) tuples
+        """
+        if not rows:
+            return
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)",
+                    [(st.st_dev, st.st_ino, algorithm, st.st_mtime_ns, st.st_size, digest)
+                     for st, algorithm, digest in rows]
+                )
+    
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+_digest_cache = _DigestCache(DIGEST_CACHE_PATH)
+
+def _hash_file(path: str, algorithm: str) -> str:
+    """
+    Hash a file in HASH_CHUNK_BYTES chunks.
+    
+    Args:
+        path: Path to file
+        algorithm: hashlib algorithm name
+        
+    Returns:
+        Hex digest of the file's contents
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(HASH_CHUNK_BYTES)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+def _hash_paths(paths: List[str], algorithm: str) -> List[dict]:
+    """
+    Hash files through the digest cache, hashing cache misses in parallel.
+    
+    Args:
+        paths: Paths to files
+        algorithm: hashlib algorithm name
+        
+    Returns:
+        One {"path", "digest", "size", "cached"} or {"path", "error"} dictionary per path
+    """
+    results = []
+    pending = []
+    for path in paths:
+        try:
+            stat_info = os.stat(path)
+        except FileNotFoundError:
+            results.append({"path": path, "error": f"File does not exist: {path}"})
+            continue
+        except OSError as e:
+            results.append({"path": path, "error": str(e)})
+            continue
+        if not stat.S_ISREG(stat_info.st_mode):
+            results.append({"path": path, "error": f"Path is not a file: {path}"})
+            continue
+        digest = _digest_cache.lookup(stat_info, algorithm)
+        result = {"path": path, "digest": digest, "size": stat_info.st_size, "cached": digest is not None}
+        results.append(result)
+        if digest is None:
+            pending.append((result, stat_info))
+    
+    def hash_one(item):
+        result, stat_info = item
+        try:
+            result["digest"] = _hash_file(result["path"], algorithm)
+            # Only trust the digest if the file did not change while it was read
+            after = os.stat(result["path"])
+        except OSError as e:
+            # Deleted or made unreadable since it was listed
+            return result, None, e
+        unchanged = (after.st_mtime_ns, after.st_size) == (stat_info.st_mtime_ns, stat_info.st_size)
+        return result, stat_info if unchanged else None, None
+    
+    stored = []
+    for result, stat_info, error in _batch_pool.map(hash_one, pending):
+        if error is not None:
+            del result["digest"], result["size"], result["cached"]
+            result["error"] = str(error)
+        elif stat_info is not None:
+            stored.append((stat_info, algorithm, result["digest"]))
+    _digest_cache.store(stored)
+    return results
+
+@mcp.tool()
+def hash_files(paths: List[str], algorithm: str = "sha256") -> List[dict]:
+    """
+    Compute content digests of files.
+    
+    Digests are cached on disk keyed by device, inode, mtime and size, so
+    unchanged files are not read again; the rest are hashed in parallel.
+    
+    Args:
+        paths: Paths to files
+        algorithm: Hash algorithm, any of hashlib.algorithms_guaranteed
+        
+    Returns:
+        List of {"path", "digest", "size", "cached"} dictionaries, in the order
+        of paths, with {"path", "error"} for paths that could not be hashed
+    """
+    if algorithm not in hashlib.algorithms_guaranteed:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+    if len(paths) > MAX_BATCH_PATHS:
+        raise ValueError(f"Too many paths in one batch: {len(paths)} (limit {MAX_BATCH_PATHS})")
+    return _hash_paths(paths, algorithm)
+
+@mcp.tool()
+def find_duplicates(root: str, min_size: int = 1, algorithm: str = "sha256", max_groups: int = 100) -> dict:
+    """
+    Find files with identical contents under a directory tree.
+    
+    Files are first grouped by size, and only files that share a size with
+    another file are hashed (through the same cache as hash_files).
+    
+    Args:
+        root: Directory to search under
+        min_size: Ignore files smaller than this many bytes
+        algorithm: Hash algorithm, any of hashlib.algorithms_guaranteed
+        max_groups: Maximum number of duplicate groups to return
+        
+    Returns:
+        Dictionary with the duplicate groups (digest, size, paths), largest
+        wasted space first, the total bytes taken by redundant copies, and
+        {"path", "error"} for files that vanished or could not be read
+    """
+    if not os.path.exists(root):
+        raise ValueError(f"Path does not exist: {root}")
+    if not os.path.isdir(root):
+        raise ValueError(f"Path is not a directory: {root}")
+    if algorithm not in hashlib.algorithms_guaranteed:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+    
+    by_size = {}
+    for path in _walk_files(root, None):
+        try:
+            stat_info = os.lstat(path)
+        except OSError:
+            continue
+        if stat.S_ISREG(stat_info.st_mode) and stat_info.st_size >= min_size:
+            by_size.setdefault(stat_info.st_size, []).append(path)
+    
+    candidates = [path for paths in by_size.values() if len(paths) > 1 for path in paths]
+    by_digest = {}
+    errors = []
+    for result in _hash_paths(candidates, algorithm):
+        if "digest" in result:
+            by_digest.setdefault((result["digest"], result["size"]), []).append(result["path"])
+        else:
+            errors.append(result)
+    
+    groups = [{"digest": digest, "size": size, "paths": paths}
+              for (digest, size), paths in by_digest.items() if len(paths) > 1]
+    groups.sort(key=lambda group: group["size"] * (len(group["paths"]) - 1), reverse=True)
+    
+    return {
+        "root": root,
+        "groups": groups[:max_groups],
+        "groups_count": len(groups),
+        "wasted_bytes": sum(group["size"] * (len(group["paths"]) - 1) for group in groups),
+        "errors": errors
+    }
+
+class _ParallelGzipWriter:
+    """
+    Write-only file object that gzips what is written to it on a thread pool.
+    
+    Input is cut into ARCHIVE_BLOCK_BYTES blocks and each block is compressed
+    as an independent gzip member. Concatenated members are a valid gzip
+    stream, so gzip, tar and zlib readers decompress the result as usual.
+    """
+    
+    def __init__(self, file, level: int, executor: ThreadPoolExecutor):
+        self.file = file
+        self.level = level
+        self.executor = executor
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.size = 0
+    
+    def _compress(self, block: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(block) + compressor.flush()
+    
+    def _drain(self, limit: int) -> None:
+        while len(self.pending) > limit:
+            data = self.pending.popleft().result()
+            self.file.write(data)
+            self.size += len(data)
+    
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= ARCHIVE_BLOCK_BYTES:
+            block = bytes(self.buffer[:ARCHIVE_BLOCK_BYTES])
+            del self.buffer[:ARCHIVE_BLOCK_BYTES]
+            self.pending.append(self.executor.submit(self._compress, block))
+            # Bound memory to a few blocks per worker
+            self._drain(ARCHIVE_WORKERS * 2)
+        return len(data)
+    
+    def close(self) -> None:
+        if self.buffer or (not self.size and not self.pending):
+            self.pending.append(self.executor.submit(self._compress, bytes(self.buffer)))
+            self.buffer = bytearray()
+        self._drain(0)
+
+def _archive_selected(name: str, include: Optional[List[str]], exclude: Optional[List[str]],
+                      is_dir: bool) -> bool:
+    """
+    Apply include/exclude globs to a path inside an archive.
+    
+    Patterns are matched against the slash-separated path relative to the
+    archive root; a pattern without a slash also matches the final component.
+    Include patterns only filter files, so directories stay traversable.
+    
+    Args:
+        name: Relative path
+        include: Globs a file must match, or None for every file
+        exclude: Globs that drop a file or a whole directory
+        is_dir: Whether the path is a directory
+    
+    Returns:
+        True if the path should be archived or extracted
+    """
+    base = name.rsplit("/", 1)[-1]
+    
+    def matches(patterns):
+        return any(fnmatch.fnmatch(name, p) or ("/" not in p and fnmatch.fnmatch(base, p)) for p in patterns)
+    
+    if exclude and matches(exclude):
+        return False
+    return is_dir or not include or matches(include)
+
+def _archive_entries(source: str, include: Optional[List[str]], exclude: Optional[List[str]]):
+    """
+    Yield (path, archive name, is_dir) for what pack_tree stores, in a stable order.
+    Excluded directories are not descended into; symlinks are not followed.
+    Directory entries are only stored when there are no include patterns.
+    """
+    for dirpath, dirnames, filenames in os.walk(source):
+        relative = os.path.relpath(dirpath, source)
+        prefix = "" if relative == "." else relative.replace(os.sep, "/") + "/"
+        dirnames.sort()
+        for name in list(dirnames):
+            if not _archive_selected(prefix + name, include, exclude, True):
+                dirnames.remove(name)
+            elif os.path.islink(os.path.join(dirpath, name)):
+                # Stored as a link, not walked into
+                dirnames.remove(name)
+                yield os.path.join(dirpath, name), prefix + name, False
+            elif not include:
+                # With include patterns only files are stored; their parents are implied
+                yield os.path.join(dirpath, name), prefix + name, True
+        for name in sorted(filenames):
+            if _archive_selected(prefix + name, include, exclude, False):
+                yield os.path.join(dirpath, name), prefix + name, False
+
+def _pack_tree(source: str, output: str, archive_format: str, include: Optional[List[str]],
+               exclude: Optional[List[str]], level: int, job: _Job, destination: Optional[str] = None) -> dict:
+    """
+    Write a directory tree to an archive file, reporting progress to job.
+    
+    The output file, and the destination it will replace, are left out of
+    the archive when they sit inside the tree. zip archives skip FIFOs,
+    sockets and devices, which they can't store and would block on.
+    
+    Args:
+        source: Directory to pack
+        output: Archive file to write; removed again if packing fails
+        archive_format: One of ARCHIVE_FORMATS
+        include: Globs selecting files to pack
+        exclude: Globs of files and directories to leave out
+        level: Compression level, 0-9
+        job: Job to report progress to and check for cancellation
+        destination: File the output will be renamed over, if any
+    
+    Returns:
+        Dictionary with the number of files, directories and bytes packed, the
+        archive size and elapsed seconds
+    """
+    started = time.monotonic()
+    totals = {"files": 0, "directories": 0, "bytes": 0}
+    skipped = []
+    # Files that must not be packed into the archive, by (device, inode)
+    own_files = set()
+    for path in (output, destination):
+        try:
+            stat_info = os.stat(path) if path is not None else None
+        except OSError:
+            continue
+        if stat_info is not None:
+            own_files.add((stat_info.st_dev, stat_info.st_ino))
+    
+    def entries():
+        for path, name, is_dir in _archive_entries(source, include, exclude):
+            job.check_cancelled()
+            stat_info = os.lstat(path)
+            if (stat_info.st_dev, stat_info.st_ino) not in own_files:
+                yield path, name, is_dir, stat_info
+    
+    def count(stat_info, is_dir):
+        if is_dir:
+            totals["directories"] += 1
+            return
+        size = stat_info.st_size
+        totals["files"] += 1
+        totals["bytes"] += size
+        job.advance(files=1, bytes=size)
+    
+    try:
+        with open(output, 'wb') as file:
+            if archive_format == "zip":
+                with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+                    for path, name, is_dir, stat_info in entries():
+                        if not (is_dir or stat.S_ISREG(stat_info.st_mode)):
+                            # zip has no portable symlinks, nor any way to store special files
+                            skipped.append(name)
+                            continue
+                        archive.write(path, name)
+                        count(stat_info, is_dir)
+            else:
+                with ThreadPoolExecutor(max_workers=ARCHIVE_WORKERS, thread_name_prefix="fs-archive") as executor:
+                    stream = _ParallelGzipWriter(file, level, executor) if archive_format == "tar.gz" else file
+                    with tarfile.open(fileobj=stream, mode='w|', format=tarfile.PAX_FORMAT) as archive:
+                        for path, name, is_dir, stat_info in entries():
+                            archive.add(path, name, recursive=False)
+                            count(stat_info, is_dir)
+                    if stream is not file:
+                        stream.close()
+    except BaseException:
+        if os.path.exists(output):
+            os.remove(output)
+        raise
+    
+    return {
+        "source": source,
+        "format": archive_format,
+        "files": totals["files"],
+        "directories": totals["directories"],
+        "bytes": totals["bytes"],
+        "size": os.path.getsize(output),
+        "seconds": time.monotonic() - started,
+        "skipped": skipped
+    }
+
+@mcp.tool()
+def pack_tree(source: str, destination: Optional[str] = None, format: str = "tar.gz",
+              include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+              level: int = 6, background: bool = False) -> Union[dict, str]:
+    """
+    Pack a directory tree into a single tar.gz, tar or zip archive.
+    
+    tar.gz output is compressed on ARCHIVE_WORKERS threads as independent gzip
+    blocks that any gzip reader accepts; zip members are deflated one at a time.
+    Symlinks are stored as links in tar archives and skipped in zip archives.
+    Without a destination the archive is kept by the server: fetch it with
+    read_archive and free it with release_archive. Archives unused for
+    TRANSFER_IDLE_TTL seconds are deleted. The archive being written is never
+    packed into itself, even when it lands inside the source tree.
+    
+    Args:
+        source: Directory to pack
+        destination: Archive file to write atomically, or None to keep it for read_archive
+        format: Archive format: "tar.gz", "tar" or "zip"
+        include: Globs selecting the files to pack (default: all)
+        exclude: Globs of files and directories to leave out
+        level: Compression level from 0 (none) to 9 (smallest)
+        background: If True, run the packing as a background job
+    
+    Returns:
+        Dictionary with the files, directories and bytes packed, the archive
+        size, elapsed seconds, skipped entries, and either the destination or
+        the archive_id to read it with; or the job id when background is True
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Source directory does not exist: {source}")
+    if not os.path.isdir(source):
+        raise ValueError(f"Source path is not a directory: {source}")
+    if format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive format: {format} (expected one of {', '.join(ARCHIVE_FORMATS)})")
+    if not 0 <= level <= 9:
+        raise ValueError(f"Compression level must be between 0 and 9: {level}")
+    
+    # Captured here: background jobs run outside the caller's request
+    owner = current_session_id()
+    archive_id = None
+    if destination is not None:
+        if os.path.isdir(destination):
+            raise ValueError(f"Destination is a directory: {destination}")
+        directory = os.path.dirname(os.path.abspath(destination))
+        if not os.path.isdir(directory):
+            raise ValueError(f"Directory does not exist: {directory}")
+    else:
+        _expire_idle(_archives, _archives_lock, "path")
+        # Reserve the slot now so concurrent calls can't overshoot the limit
+        archive_id = uuid.uuid4().hex
+        with _archives_lock:
+            if len(_archives) >= MAX_ARCHIVE_BLOBS:
+                raise ValueError(f"Too many archives held (limit {MAX_ARCHIVE_BLOBS}); free some with release_archive")
+            _archives[archive_id] = {"path": None, "size": 0, "owner": owner, "used": time.monotonic()}
+    
+    def operation(job):
+        if destination is not None:
+            output = _temp_path_for(destination)
+            result = _pack_tree(source, output, format, include, exclude, level, job, destination)
+            _commit_temp_file(output, destination)
+            _stat_cache.invalidate(destination)
+            result["destination"] = destination
+            return result
+        try:
+            fd, output = tempfile.mkstemp(prefix="fs-archive-", suffix="." + format)
+            os.close(fd)
+            result = _pack_tree(source, output, format, include, exclude, level, job)
+        except BaseException:
+            with _archives_lock:
+                _archives.pop(archive_id, None)
+            raise
+        with _archives_lock:
+            _archives[archive_id] = {"path": output, "size": result["size"], "owner": owner,
+                                     "used": time.monotonic()}
+        result["archive_id"] = archive_id
+        return result
+    
+    arguments = {"source": source, "destination": destination, "format": format}
+    if background:
+        return _start_job("pack_tree", arguments, operation)
+    return operation(_Job("pack_tree", arguments))
+
+def _get_archive(archive_id: str) -> dict:
+    with _archives_lock:
+        archive = _archives.get(archive_id)
+    # Archives belong to the client session that packed them, and are only
+    # readable once packing has finished
+    if archive is None or archive["owner"] != current_session_id() or archive["path"] is None:
+        raise ValueError(f"Unknown archive id: {archive_id}")
+    archive["used"] = time.monotonic()
+    return archive
+
+@mcp.tool()
+def read_archive(archive_id: str, offset: int = 0, length: Optional[int] = None) -> dict:
+    """
+    Read a chunk of an archive packed by pack_tree without a destination.
+    
+    Args:
+        archive_id: Archive id returned by pack_tree
+        offset: Byte offset to read from (use next_offset to continue)
+        length: Maximum number of bytes to return (defaults to MAX_READ_BYTES)
+    
+    Returns:
+        Dictionary with the base64-encoded data, the offset it starts at,
+        next_offset, the archive size and whether the end was reached
+    """
+    archive = _get_archive(archive_id)
+    length = MAX_READ_BYTES if length is None else min(length, MAX_READ_BYTES)
+    if offset < 0 or length < 0:
+        raise ValueError(f"Offset and length must be non-negative: {offset}, {length}")
+    with open(archive["path"], 'rb') as file:
+        file.seek(offset)
+        data = file.read(length)
+    next_offset = offset + len(data)
+    return {
+        "data": base64.b64encode(data).decode("ascii"),
+        "offset": offset,
+        "next_offset": next_offset,
+        "size": archive["size"],
+        "eof": next_offset >= archive["size"]
+    }
+
+@mcp.tool()
+def release_archive(archive_id: str) -> bool:
+    """
+    Delete an archive packed by pack_tree without a destination.
+    
+    Args:
+        archive_id: Archive id returned by pack_tree
+    
+    Returns:
+        True if successful
+    """
+    archive = _get_archive(archive_id)
+    with _archives_lock:
+        _archives.pop(archive_id, None)
+    if os.path.exists(archive["path"]):
+        os.remove(archive["path"])
+    return True
+
+def _extraction_target(root: str, name: str) -> str:
+    """
+    Resolve where an archive member would be extracted, refusing paths that escape root.
+    
+    Args:
+        root: Real path of the extraction directory
+        name: Member name from the archive
+    
+    Returns:
+        Absolute target path
+    """
+    target = os.path.realpath(os.path.join(root, name))
+    if target != root and not target.startswith(root + os.sep):
+        raise ValueError(f"Archive member escapes the destination: {name}")
+    return target
+
+def _unpack_archive(source: str, destination: str, include: Optional[List[str]],
+                    exclude: Optional[List[str]], job: _Job) -> dict:
+    """
+    Extract an archive into a directory, reporting progress to job.
+    
+    Args:
+        source: tar, tar.gz (or other compressed tar) or zip archive
+        destination: Directory to extract into, created if missing
+        include: Globs selecting the files to extract
+        exclude: Globs of files and directories to leave out
+        job: Job to report progress to and check for cancellation
+    
+    Returns:
+        Dictionary with the number of files, directories and bytes extracted
+        and elapsed seconds
+    """
+    started = time.monotonic()
+    os.makedirs(destination, exist_ok=True)
+    root = os.path.realpath(destination)
+    totals = {"files": 0, "directories": 0, "bytes": 0}
+    
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            members = [m for m in archive.infolist()
+                       if _archive_selected(m.filename.rstrip("/"), include, exclude, m.is_dir())]
+        for member in members:
+            _extraction_target(root, member.filename)
+        local = threading.local()
+        opened = []
+    
+        def extract(member):
+            # ZipFile objects aren't safe to share between threads
+            if job.cancel_event.is_set():
+                return
+            if not hasattr(local, "archive"):
+                local.archive = zipfile.ZipFile(source)
+                opened.append(local.archive)
+            local.archive.extract(member, root)
+            job.advance(files=1, bytes=member.file_size)
+    
+        for member in members:
+            if member.is_dir():
+                os.makedirs(_extraction_target(root, member.filename), exist_ok=True)
+                totals["directories"] += 1
+        files = [m for m in members if not m.is_dir()]
+        try:
+            with ThreadPoolExecutor(max_workers=ARCHIVE_WORKERS, thread_name_prefix="fs-archive") as executor:
+                list(executor.map(extract, files))
+        finally:
+            for archive in opened:
+                archive.close()
+        job.check_cancelled()
+        totals["files"] = len(files)
+        totals["bytes"] = sum(m.file_size for m in files)
+    else:
+        with open(source, 'rb') as file:
+            magic = file.read(2)
+        # tarfile's own stream reader stops after the first gzip member, which
+        # would truncate pack_tree's multi-member tar.gz output
+        compressed = gzip.open(source) if magic == b"\x1f\x8b" else None
+        try:
+            try:
+                if compressed is not None:
+                    archive = tarfile.open(fileobj=compressed, mode='r|')
+                else:
+                    archive = tarfile.open(source, 'r|*')
+            except (tarfile.TarError, OSError):
+                raise ValueError(f"Not a tar or zip archive: {source}")
+            with archive:
+                for member in archive:
+                    job.check_cancelled()
+                    if not _archive_selected(member.name, include, exclude, member.isdir()):
+                        continue
+                    _extraction_target(root, member.name)
+                    try:
+                        if hasattr(tarfile, "data_filter"):
+                            # Also rejects links pointing outside root, device files and setuid bits
+                            archive.extract(member, root, filter="data")
+                        else:
+                            if member.issym() or member.islnk():
+                                _extraction_target(root, os.path.join(os.path.dirname(member.name), member.linkname))
+                            archive.extract(member, root)
+                    except tarfile.TarError as e:
+                        raise ValueError(f"Cannot extract archive member {member.name}: {e}")
+                    if member.isdir():
+                        totals["directories"] += 1
+                    else:
+                        totals["files"] += 1
+                        totals["bytes"] += member.size
+                        job.advance(files=1, bytes=member.size)
+        finally:
+            if compressed is not None:
+                compressed.close()
+    
+    _stat_cache.invalidate(destination)
+    return {
+        "source": source,
+        "destination": destination,
+        "files": totals["files"],
+        "directories": totals["directories"],
+        "bytes": totals["bytes"],
+        "seconds": time.monotonic() - started
+    }
+
+@mcp.tool()
+def unpack_archive(source: str, destination: str, include: Optional[List[str]] = None,
+                   exclude: Optional[List[str]] = None, background: bool = False) -> Union[dict, str]:
+    """
+    Extract a tar, tar.gz or zip archive into a directory.
+    
+    Members that would land outside destination are refused. zip members are
+    extracted in parallel; tar archives are streamed. To unpack an archive the
+    client holds, upload it first with begin_upload and upload_chunk using
+    encoding="base64".
+    
+    Args:
+        source: Archive file path
+        destination: Directory to extract into, created if missing
+        include: Globs selecting the files to extract (default: all)
+        exclude: Globs of files and directories to leave out
+        background: If True, run the extraction as a background job
+    
+    Returns:
+        Dictionary with the files, directories and bytes extracted and elapsed
+        seconds, or the job id when background is True
+    """
+    if not os.path.exists(source):
+        raise ValueError(f"Archive does not exist: {source}")
+    if not os.path.isfile(source):
+        raise ValueError(f"Archive is not a file: {source}")
+    if os.path.exists(destination) and not os.path.isdir(destination):
+        raise ValueError(f"Destination is not a directory: {destination}")
+    
+    arguments = {"source": source, "destination": destination}
+    
+    def operation(job):
+        return _unpack_archive(source, destination, include, exclude, job)
+    
+    if background:
+        return _start_job("unpack_archive", arguments, operation)
+    return operation(_Job("unpack_archive", arguments))
+
+class _ChangeFeed:
+    """
+    Sequence-numbered log of the changes under a root.
+    
+    A daemon thread blocks on inotify and appends every create, modify, delete
+    and move to a bounded backlog as it happens; without inotify, or once the
+    tree outgrows the available watches, it diffs periodic rescans instead.
+    Repeated modifications of one path are folded into a single entry as they
+    arrive, so a busy file costs one slot. A cursor is the sequence number of
+    the last event a client has seen; it stays valid until the events after it
+    are dropped from the backlog or lost to an inotify queue overflow.
+    """
+    
+    def __init__(self, root: str, recursive: bool):
+        self.id = uuid.uuid4().hex
+        self.root = root
+        self.recursive = recursive
+        self.lock = threading.Lock()
+        self.events = OrderedDict()
+        self.modified = {}
+        self.seq = 0
+        self.truncated_seq = 0
+        self.listeners = []
+        self.pending = []
+        self.snapshot = None
+        self.stop_event = threading.Event()
+        self.watcher = _open_inotify(_WATCH_MASK)
+        if self.watcher is not None:
+            self._watch_tree(root, emit=False)
+        if self.watcher is None:
+            self.snapshot = self._scan()
+        self.thread = threading.Thread(target=self._run, name="fs-watch", daemon=True)
+        self.thread.start()
+    
+    def close(self) -> None:
+        # The thread closes the watcher itself once it notices
+        self.stop_event.set()
+    
+    def _append(self, kind: str, path: str, is_dir: bool, old_path: Optional[str] = None) -> None:
+        with self.lock:
+            self.seq += 1
+            event = {"seq": self.seq, "type": kind, "path": path, "is_dir": is_dir}
+            if old_path is not None:
+                event["old_path"] = old_path
+            previous = self.modified.pop(path, None)
+            if kind == "modified":
+                if previous is not None:
+                    self.events.pop(previous, None)
+                self.modified[path] = self.seq
+            self.events[self.seq] = event
+            while len(self.events) > MAX_CHANGE_BACKLOG:
+                seq, dropped = self.events.popitem(last=False)
+                self.truncated_seq = seq
+                if self.modified.get(dropped["path"]) == seq:
+                    del self.modified[dropped["path"]]
+            self.pending.append(event)
+    
+    def _overflow(self) -> None:
+        """Forget the backlog after events were lost, forcing every client to reset."""
+        with self.lock:
+            self.seq += 1
+            self.truncated_seq = self.seq
+            self.events.clear()
+            self.modified.clear()
+    
+    def _fall_back_to_polling(self) -> None:
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        self.snapshot = self._scan()
+        self._overflow()
+    
+    def _watch_tree(self, top: str, emit: bool) -> None:
+        """Watch top (and, recursively, its subdirectories), optionally reporting what is already inside."""
+        stack = [top]
+        while stack and self.watcher is not None:
+            directory = stack.pop()
+            try:
+                self.watcher.add_watch(directory)
+            except OSError as e:
+                if e.errno in (errno.ENOSPC, errno.ENOMEM):
+                    # Out of inotify watches; rescanning is slower but complete
+                    self._fall_back_to_polling()
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if emit:
+                            self._append("created", entry.path, is_dir)
+                        if is_dir and self.recursive:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+            if not self.recursive:
+                return
+    
+    def _apply_events(self, raw: list) -> None:
+        moves = {}
+        for mask, cookie, path in raw:
+            if path is None or mask & IN_Q_OVERFLOW:
+                self._overflow()
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # Subdirectories are reported by their parent; only the root matters here
+                if path == self.root:
+                    self._append("deleted", path, True)
+                continue
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & IN_MOVED_FROM:
+                moves[cookie] = (path, is_dir)
+                if is_dir and self.watcher is not None:
+                    self.watcher.remove_tree(path)
+            elif mask & IN_MOVED_TO:
+                source = moves.pop(cookie, None)
+                if source is None:
+                    self._append("created", path, is_dir)
+                else:
+                    self._append("moved", path, is_dir, old_path=source[0])
+                if is_dir and self.recursive:
+                    self._watch_tree(path, emit=source is None)
+            elif mask & IN_CREATE:
+                self._append("created", path, is_dir)
+                if is_dir and self.recursive:
+                    self._watch_tree(path, emit=True)
+            elif mask & IN_DELETE:
+                self._append("deleted", path, is_dir)
+            elif mask & (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE):
+                self._append("modified", path, is_dir)
+        # Moved out of the tree: from here it looks like a delete
+        for path, is_dir in moves.values():
+            self._append("deleted", path, is_dir)
+    
+    def _scan(self) -> dict:
+        snapshot = {}
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            stat_info = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        is_dir = stat.S_ISDIR(stat_info.st_mode)
+                        snapshot[entry.path] = (is_dir, stat_info.st_ino, stat_info.st_size,
+                                                None if is_dir else stat_info.st_mtime_ns)
+                        if is_dir and self.recursive:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+        return snapshot
+    
+    def _poll(self) -> None:
+        current = self._scan()
+        previous = self.snapshot
+        for path in sorted(current):
+            if path not in previous:
+                self._append("created", path, current[path][0])
+            elif current[path] != previous[path]:
+                self._append("modified", path, current[path][0])
+        for path in sorted(previous.keys() - current.keys(), reverse=True):
+            self._append("deleted", path, previous[path][0])
+        self.snapshot = current
+    
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            if self.watcher is None:
+                if self.stop_event.wait(CHANGE_POLL_INTERVAL):
+                    break
+                self._poll()
+            else:
+                ready, _, _ = select.select([self.watcher.fileno()], [], [], 1.0)
+                if ready:
+                    self._apply_events(self.watcher.read_events())
+            with self.lock:
+                batch, self.pending = self.pending, []
+                listeners = list(self.listeners)
+            if batch:
+                for listener in listeners:
+                    listener(self, batch)
+        if self.watcher is not None:
+            self.watcher.close()
+    
+    def read(self, after: int, max_events: int) -> Optional[tuple]:
+        """
+        Get the events after a cursor.
+    
+        Args:
+            after: Sequence number of the last event the caller has seen
+            max_events: Maximum number of events to return
+    
+        Returns:
+            Tuple of (events, new cursor, whether more events are pending), or
+            None if events after the cursor were lost and the caller must reset
+        """
+        with self.lock:
+            if after < self.truncated_seq or after > self.seq:
+                return None
+            events = []
+            more = False
+            for seq, event in self.events.items():
+                if seq <= after:
+                    continue
+                if len(events) >= max_events:
+                    more = True
+                    break
+                events.append(event)
+            return events, events[-1]["seq"] if events else self.seq, more
+
+def _coalesce_changes(events: List[dict]) -> List[dict]:
+    """
+    Fold consecutive changes to the same path into the net change.
+    
+    Created then modified is reported as created, created then deleted is
+    dropped, deleted then created becomes modified, and repeated changes of
+    one kind are reported once. A move ends folding for both of its paths.
+    
+    Args:
+        events: Events in sequence order
+    
+    Returns:
+        Coalesced events, in the order each path first changed
+    """
+    folded = []
+    latest = {}
+    for event in events:
+        kind = {key: value for key, value in event.items() if key != "seq"}
+        path = kind["path"]
+        if kind["type"] == "moved":
+            latest.pop(path, None)
+            latest.pop(kind["old_path"], None)
+            folded.append(kind)
+            continue
+        index = latest.get(path)
+        if index is None or folded[index] is None:
+            latest[path] = len(folded)
+            folded.append(kind)
+            continue
+        previous = folded[index]["type"]
+        if previous == "created" and kind["type"] == "deleted":
+            folded[index] = None
+            del latest[path]
+        elif previous == "created":
+            continue
+        elif previous == "deleted" and kind["type"] == "created":
+            folded[index] = dict(kind, type="modified")
+        else:
+            folded[index] = kind
+    return [event for event in folded if event is not None]
+
+def _get_change_feed(root: str, recursive: bool = True) -> _ChangeFeed:
+    """
+    Get the change feed for a directory, starting it on first use.
+    
+    Args:
+        root: Absolute, normalised directory
+        recursive: Whether the feed covers the whole tree or only direct children
+    
+    Returns:
+        The directory's _ChangeFeed
+    """
+    with _feeds_lock:
+        key = (root, recursive)
+        feed = _feeds.get(key)
+        if feed is None or feed.stop_event.is_set():
+            feed = _feeds[key] = _ChangeFeed(root, recursive)
+        _feeds.move_to_end(key)
+        # Feeds serving subscriptions stay open however old they are
+        idle = [k for k, f in _feeds.items() if not f.listeners]
+        for evicted in idle[:max(0, len(idle) - MAX_CHANGE_FEEDS)]:
+            _feeds.pop(evicted).close()
+    return feed
+
+@mcp.tool()
+def watch_changes(root: str, cursor: Optional[str] = None, max_events: int = DEFAULT_CHANGE_EVENTS) -> dict:
+    """
+    Get every change under a directory since a cursor.
+    
+    The first call, without a cursor, starts watching the tree and returns a
+    cursor and no events: list the tree once, then keep passing the returned
+    cursor back to receive each create, modify, delete and move since the
+    previous call. Changes to the same path are coalesced. When reset is True
+    the events since the cursor are no longer known (the backlog overflowed or
+    the watch restarted); list the tree again and continue from the new cursor.
+    
+    Args:
+        root: Directory to watch recursively
+        cursor: Cursor returned by the previous call
+        max_events: Maximum number of raw events to consume in one call
+    
+    Returns:
+        Dictionary with the events (type, path, is_dir, and old_path for moves),
+        the cursor for the next call, whether more events are waiting, and
+        whether the client must reset
+    """
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise ValueError(f"Directory does not exist: {root}")
+    if max_events < 1:
+        raise ValueError(f"max_events must be positive: {max_events}")
+    
+    feed = _get_change_feed(root)
+    if cursor is None:
+        return {"root": root, "events": [], "cursor": _encode_cursor([feed.id, feed.seq]),
+                "more": False, "reset": False}
+    
+    state = _decode_cursor(cursor)
+    if not isinstance(state, list) or len(state) != 2:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    feed_id, after = state
+    changes = feed.read(after, max_events) if feed_id == feed.id else None
+    if changes is None:
+        return {"root": root, "events": [], "cursor": _encode_cursor([feed.id, feed.seq]),
+                "more": False, "reset": True}
+    events, last_seq, more = changes
+    return {"root": root, "events": _coalesce_changes(events), "cursor": _encode_cursor([feed.id, last_seq]),
+            "more": more, "reset": False}
+
+def _subscription_target(uri: str) -> tuple:
+    """
+    Resolve a file:// or dir:// resource URI for subscription.
+    
+    Args:
+        uri: Resource URI
+    
+    Returns:
+        Tuple of (path, directory whose changes affect the resource)
+    """
+    scheme, _, path = uri.partition("://")
+    path = urllib.parse.unquote(path)
+    if scheme == "file":
+        # URL normalisation adds a trailing slash to file://name
+        path = os.path.abspath(path.rstrip("/") or "/")
+        return path, os.path.dirname(path)
+    if scheme == "dir":
+        path = os.path.abspath(path)
+        return path, path
+    raise ValueError(f"Resource does not support subscriptions: {uri}")
+
+def _release_subscription_feeds() -> None:
+    """Stop and evict the feeds of directories no subscription uses any more."""
+    with _subscriptions_lock:
+        in_use = {subscription["directory"] for subscription in _subscriptions.values()}
+        with _feeds_lock:
+            # Only subscriptions use the feeds that watch direct children alone
+            unused = [key for key in _feeds if not key[1] and key[0] not in in_use]
+            feeds = [_feeds.pop(key) for key in unused]
+    for feed in feeds:
+        with feed.lock:
+            feed.listeners.clear()
+        feed.close()
+
+def _drop_subscriber(token: str, uri: Optional[str] = None) -> None:
+    """
+    Forget a session's subscriptions and stop the feeds nobody needs any more.
+    
+    Args:
+        token: Token identifying the session in _subscriptions
+        uri: Subscription to drop, or None for all of the session's subscriptions
+    """
+    with _subscriptions_lock:
+        for key in [uri] if uri is not None else list(_subscriptions):
+            subscription = _subscriptions.get(key)
+            if subscription is None:
+                continue
+            subscription["sessions"].pop(token, None)
+            if not subscription["sessions"]:
+                del _subscriptions[key]
+    _release_subscription_feeds()
+
+def _subscriber_token(session) -> str:
+    """Get the token for a session, dropping its subscriptions once the session is collected."""
+    with _subscriptions_lock:
+        token = _subscriber_tokens.get(session)
+        if token is None:
+            token = _subscriber_tokens[session] = uuid.uuid4().hex
+            weakref.finalize(session, _drop_subscriber_later, token)
+    return token
+
+def _drop_subscriber_later(token: str) -> None:
+    """Drop a collected session's subscriptions from a fresh thread, as the collector may hold our locks."""
+    threading.Thread(target=_drop_subscriber, args=(token,), name="fs-unsubscribe", daemon=True).start()
+
+def _drop_if_failed(token: str, future) -> None:
+    """Drop a session's subscriptions when a notification to it failed, which means it has closed."""
+    if not future.cancelled() and future.exception() is not None:
+        _drop_subscriber(token)
+
+def _notify_subscribers(feed: _ChangeFeed, events: List[dict]) -> None:
+    """Send a resource-updated notification to every session subscribed to a changed resource."""
+    changed = {path for event in events for path in (event["path"], event.get("old_path")) if path}
+    with _subscriptions_lock:
+        targets = [(uri, list(subscription["sessions"].items()))
+                   for uri, subscription in _subscriptions.items()
+                   if subscription["directory"] == feed.root
+                   and (subscription["path"] == feed.root or subscription["path"] in changed)]
+    closed = set()
+    for uri, sessions in targets:
+        for token, (session_ref, loop) in sessions:
+            session = session_ref()
+            if session is None or token in closed:
+                closed.add(token)
+                continue
+            try:
+                future = asyncio.run_coroutine_threadsafe(session.send_resource_updated(AnyUrl(uri)), loop)
+            except RuntimeError:
+                # The session's event loop has shut down
+                closed.add(token)
+                continue
+            future.add_done_callback(functools.partial(_drop_if_failed, token))
+    for token in closed:
+        _drop_subscriber(token)
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl) -> None:
+    """Notify the calling session whenever a file:// or dir:// resource changes."""
+    uri = str(uri)
+    path, directory = _subscription_target(uri)
+    if not os.path.isdir(directory):
+        raise ValueError(f"Directory does not exist: {directory}")
+    session = mcp._mcp_server.request_context.session
+    token = _subscriber_token(session)
+    loop = asyncio.get_running_loop()
+    # Register first so a concurrent unsubscribe cannot evict the feed in between
+    with _subscriptions_lock:
+        subscription = _subscriptions.setdefault(uri, {"path": path, "directory": directory, "sessions": {}})
+        subscription["sessions"][token] = (weakref.ref(session), loop)
+    try:
+        feed = await loop.run_in_executor(None, _get_change_feed, directory, False)
+    except BaseException:
+        _drop_subscriber(token, uri)
+        raise
+    with feed.lock:
+        if _notify_subscribers not in feed.listeners:
+            feed.listeners.append(_notify_subscribers)
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl) -> None:
+    """Stop notifying the calling session about a resource."""
+    session = mcp._mcp_server.request_context.session
+    with _subscriptions_lock:
+        token = _subscriber_tokens.get(session)
+    if token is not None:
+        _drop_subscriber(token, str(uri))
+
+_get_capabilities = mcp._mcp_server.get_capabilities
+
+def _get_capabilities_with_subscribe(notification_options, experimental_capabilities):
+    """Advertise resource subscriptions, which the low-level server always reports as unsupported."""
+    capabilities = _get_capabilities(notification_options, experimental_capabilities)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+mcp._mcp_server.get_capabilities = _get_capabilities_with_subscribe
+
+@mcp.tool()
+def get_cache_stats() -> dict:
+    """
+    Get hit and miss counters for the server's caches, and the load on the tool worker pool.
+    
+    Returns:
+        Dictionary of statistics per cache, plus the worker pool's
+        running, queued, rejected and timed-out call counts
+    """
+    return {"stat_cache": _stat_cache.stats(), "digest_cache": _digest_cache.stats(),
+            "disk_usage_cache": _disk_usage_cache.stats(), "memo": memo_stats(), "tool_pool": offload_stats()}
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    # Started as a script, this module has no import spec, so multiprocessing
+    # would re-run it in every grep worker to rebuild __main__. A spec named
+    # __main__ tells it not to; the workers only need grep_worker
+    __spec__ = importlib.machinery.ModuleSpec("__main__", None)
+    serve(mcp, "Filesystem MCP server")
\ No newline at end of file
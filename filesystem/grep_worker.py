@@ -0,0 +1,107 @@
+import mmap
+import os
+import re
+import stat
+
+# grep_files searches files in worker processes that import only this module,
+# so it must stay free of import side effects and of imports from the server
+
+# Bytes sniffed for a NUL byte to decide that a file is binary
+BINARY_SNIFF_BYTES = 8192
+
+# Longest line (in characters) returned in a grep result
+MAX_GREP_LINE = 500
+
+def _grep_line(mapped: mmap.mmap, start: int, end: int) -> str:
+    """
+    Decode one line of a mapped file for a grep result.
+    
+    Args:
+        mapped: Mapped file
+        start: Offset of the first byte of the line
+        end: Offset of the line's newline (or end of file)
+        
+    Returns:
+        The line without its line ending, truncated to MAX_GREP_LINE characters
+    """
+    line = mapped[start:min(end, start + MAX_GREP_LINE * 4)].decode("utf-8", errors="replace")
+    return line.rstrip("\r")[:MAX_GREP_LINE]
+
+def grep_file(path: str, pattern: bytes, flags: int, context_lines: int, skip: int, limit: int) -> tuple:
+    """
+    Search one file for lines matching pattern. Runs in a grep worker process.
+    
+    Anything but a regular file (a FIFO or device, for instance) is skipped;
+    it is opened non-blocking so that a FIFO can't hang the worker.
+    
+    Args:
+        path: Path to file
+        pattern: Regular expression as bytes
+        flags: re flags for the pattern
+        context_lines: Number of lines of context before and after each match
+        skip: Number of matching lines to skip (to resume from a cursor)
+        limit: Maximum number of matching lines to return
+        
+    Returns:
+        Tuple of (matches, more) where more is True if the file has further
+        matching lines beyond limit
+    """
+    matches = []
+    try:
+        with open(os.open(path, os.O_RDONLY | os.O_NONBLOCK), 'rb') as file:
+            stat_info = os.fstat(file.fileno())
+            if not stat.S_ISREG(stat_info.st_mode) or stat_info.st_size == 0:
+                return matches, False
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if b"\0" in mapped[:BINARY_SNIFF_BYTES]:
+                    return matches, False
+                size = len(mapped)
+                line_number = 1
+                counted_to = 0
+                last_line_start = -1
+                seen = 0
+                for match in re.finditer(pattern, mapped, flags):
+                    line_start = mapped.rfind(b"\n", 0, match.start()) + 1
+                    if line_start == last_line_start:
+                        continue
+                    last_line_start = line_start
+                    line_number += mapped[counted_to:line_start].count(b"\n")
+                    counted_to = line_start
+                    seen += 1
+                    if seen <= skip:
+                        continue
+                    if len(matches) >= limit:
+                        return matches, True
+                    
+                    line_end = mapped.find(b"\n", line_start)
+                    if line_end == -1:
+                        line_end = size
+                    before = []
+                    position = line_start
+                    for _ in range(context_lines):
+                        if position == 0:
+                            break
+                        previous = mapped.rfind(b"\n", 0, position - 1) + 1
+                        before.insert(0, _grep_line(mapped, previous, position - 1))
+                        position = previous
+                    after = []
+                    position = line_end
+                    for _ in range(context_lines):
+                        if position >= size - 1:
+                            break
+                        following = mapped.find(b"\n", position + 1)
+                        if following == -1:
+                            following = size
+                        after.append(_grep_line(mapped, position + 1, following))
+                        position = following
+                    
+                    matches.append({
+                        "path": path,
+                        "line_number": line_number,
+                        "line": _grep_line(mapped, line_start, line_end),
+                        "before": before,
+                        "after": after
+                    })
+    except (OSError, ValueError):
+        pass
+    return matches, False
@@ -0,0 +1,145 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Sequence
+
+# Memoized functions by name, for memo_stats
+_registry = {}
+
+
+def _file_signature(path) -> Optional[tuple]:
+    """
+    Identify the current version of a file or directory.
+
+    Args:
+        path: Path to check
+
+    Returns:
+        Tuple of (device, inode, size, mtime, ctime), or None if the path does not exist
+    """
+    try:
+        stat_info = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (stat_info.st_dev, stat_info.st_ino, stat_info.st_size,
+            stat_info.st_mtime_ns, stat_info.st_ctime_ns)
+
+
+class _Memo:
+    """LRU/TTL result cache for one function."""
+
+    def __init__(self, fn, maxsize: int, ttl: Optional[float], path_args: Sequence[str],
+                 cacheable: Optional[Callable[[Any], bool]]):
+        self.fn = fn
+        self.cacheable = cacheable
+        self.signature = inspect.signature(fn)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path_args = tuple(path_args)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, args, kwargs) -> tuple:
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = json.dumps(bound.arguments, sort_keys=True, default=repr)
+        paths = tuple(bound.arguments.get(name) for name in self.path_args)
+        return key, paths
+
+    def __call__(self, *args, **kwargs):
+        key, paths = self._key(args, kwargs)
+        # Files are checked before the lookup so a result is only reused if every
+        # path it depends on is unchanged since it was computed
+        signatures = tuple(_file_signature(path) for path in paths)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                result, expires_at, cached_signatures = entry
+                if (expires_at is None or expires_at > now) and cached_signatures == signatures:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+            self.misses += 1
+
+        result = self.fn(*args, **kwargs)
+
+        if self.cacheable is not None and not self.cacheable(result):
+            return result
+        # Don't cache if a path changed while the function ran
+        if tuple(_file_signature(path) for path in paths) != signatures:
+            return result
+        with self.lock:
+            self.entries[key] = (result, None if self.ttl is None else now + self.ttl, signatures)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+def memoize(maxsize: int = 1024, ttl: Optional[float] = None, path_args: Sequence[str] = (),
+            cacheable: Optional[Callable[[Any], bool]] = None):
+    """
+    Cache the results of a pure or idempotent tool.
+
+    Apply it below @mcp.tool() or @mcp.resource(); the wrapper keeps the
+    function's signature so FastMCP still sees the original arguments. Results
+    are keyed by the bound arguments, evicted least recently used beyond
+    maxsize and expired after ttl seconds. For filesystem tools, name the
+    arguments holding paths in path_args: a cached result is only reused while
+    each path's inode, size, mtime and ctime are unchanged. Exceptions, and
+    results rejected by cacheable, are never cached.
+
+    Args:
+        maxsize: Maximum number of cached results
+        ttl: Seconds a result stays valid, or None for no expiry
+        path_args: Names of arguments that are paths the result depends on
+        cacheable: Predicate deciding whether a result is worth keeping, e.g. to skip large ones
+
+    Returns:
+        Decorator for the tool function
+    """
+    def decorator(fn):
+        memo = _Memo(fn, maxsize, ttl, path_args, cacheable)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return memo(*args, **kwargs)
+
+        wrapper.cache_clear = memo.clear
+        wrapper.cache_stats = memo.stats
+        _registry[fn.__name__] = memo
+        return wrapper
+
+    return decorator
+
+
+def memo_stats() -> dict:
+    """
+    Get hit-rate statistics for every memoized function.
+
+    Returns:
+        Dictionary mapping function names to their cache statistics
+    """
+    return {name: memo.stats() for name, memo in _registry.items()}
@@ -0,0 +1,306 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set to serve the Prometheus text format over HTTP at /metrics on this port;
+# serve() starts the exporter, so importing a server module never binds it
+METRICS_PORT = os.environ.get("MCP_METRICS_PORT")
+METRICS_HOST = os.environ.get("MCP_METRICS_HOST", "127.0.0.1")
+
+# Bytes counted for a number, boolean or any other value that is not a string,
+# bytes or container when estimating payload sizes
+SCALAR_SIZE = 8
+
+# Metrics per instrumented tool or resource, keyed by (kind, name)
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _payload_size(value: Any) -> int:
+    """
+    Estimate the size of a tool's arguments or result on the wire.
+
+    Counting must stay cheap next to the call itself, so nothing is serialized:
+    strings and bytes count their length, dictionaries, lists, tuples and sets
+    the sizes of their keys and items, and any other value a small constant.
+
+    Args:
+        value: Arguments dictionary or return value
+
+    Returns:
+        Estimated size in bytes
+    """
+    size = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, (str, bytes, bytearray)):
+            size += len(item)
+        elif isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+        elif item is not None:
+            size += SCALAR_SIZE
+    return size
+
+
+class _CallMetrics:
+    """Counters and latency histogram for one tool or resource."""
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def start(self, kwargs: dict) -> float:
+        size = _payload_size(kwargs)
+        with self.lock:
+            self.calls += 1
+            self.bytes_in += size
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return time.perf_counter()
+
+    def finish(self, started: float, result: Any = None, failed: bool = False) -> None:
+        elapsed = time.perf_counter() - started
+        size = 0 if failed else _payload_size(result)
+        bucket = len(LATENCY_BUCKETS)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                bucket = index
+                break
+        with self.lock:
+            self.in_flight -= 1
+            self.errors += failed
+            self.bytes_out += size
+            self.latency_sum += elapsed
+            self.buckets[bucket] += 1
+
+    def _quantile(self, counts: list, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of calls."""
+        total = sum(counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+            seen += count
+            if seen >= fraction * total:
+                return bound
+        return float("inf")
+
+    def stats(self) -> dict:
+        with self.lock:
+            counts = list(self.buckets)
+            stats = {
+                "kind": self.kind,
+                "name": self.name,
+                "calls": self.calls,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "latency_sum_seconds": self.latency_sum,
+            }
+        finished = sum(counts)
+        stats["latency_mean_seconds"] = stats["latency_sum_seconds"] / finished if finished else None
+        stats["latency_p50_seconds_le"] = self._quantile(counts, 0.50)
+        stats["latency_p99_seconds_le"] = self._quantile(counts, 0.99)
+        stats["latency_buckets"] = {str(bound): count for bound, count
+                                    in zip(LATENCY_BUCKETS + ("+Inf",), counts)}
+        return stats
+
+
+def _metrics_for(kind: str, name: str) -> _CallMetrics:
+    with _registry_lock:
+        metrics = _registry.get((kind, name))
+        if metrics is None:
+            metrics = _registry[(kind, name)] = _CallMetrics(kind, name)
+        return metrics
+
+
+def _instrumented(fn, metrics: _CallMetrics):
+    """Wrap fn so every call is recorded in metrics, keeping its signature."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = metrics.start(kwargs)
+            try:
+                result = await fn(*args, **kwargs)
+            except BaseException:
+                metrics.finish(started, failed=True)
+                raise
+            metrics.finish(started, result)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = metrics.start(kwargs)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            metrics.finish(started, failed=True)
+            raise
+        metrics.finish(started, result)
+        return result
+    return wrapper
+
+
+def instrument(server) -> None:
+    """
+    Record call metrics for every tool and resource registered on a FastMCP server.
+
+    Call it right after creating the server, before any @server.tool() or
+    @server.resource() decorator runs. The registered tools are wrapped; the
+    module-level functions are returned unwrapped, so internal calls between
+    tools are not counted. Also registers metrics:// (JSON) and
+    metrics://prometheus (Prometheus text format) resources. The /metrics
+    HTTP exporter is started separately, by serve() or serve_metrics(), so
+    that importing the server has no side effects beyond registration.
+
+    Args:
+        server: FastMCP server to instrument
+    """
+    tool, resource = server.tool, server.resource
+
+    def instrumented_tool(name: Optional[str] = None, description: Optional[str] = None):
+        register = tool(name=name, description=description)
+
+        def decorator(fn):
+            register(_instrumented(fn, _metrics_for("tool", name or fn.__name__)))
+            return fn
+
+        return decorator
+
+    def instrumented_resource(uri: str, **kwargs):
+        register = resource(uri, **kwargs)
+
+        def decorator(fn):
+            register(_instrumented(fn, _metrics_for("resource", uri)))
+            return fn
+
+        return decorator
+
+    server.tool = instrumented_tool
+    server.resource = instrumented_resource
+
+    @resource("metrics://", mime_type="application/json")
+    def get_metrics() -> dict:
+        """Get call counts, errors, latency histograms, bytes and in-flight calls per tool and resource"""
+        return metrics_snapshot()
+
+    @resource("metrics://prometheus")
+    def get_prometheus_metrics() -> str:
+        """Get per-tool and per-resource metrics in the Prometheus text format"""
+        return prometheus_text(server.name)
+
+
+def metrics_snapshot() -> dict:
+    """
+    Get the metrics of every instrumented tool and resource.
+
+    Returns:
+        Dictionary mapping "kind:name" to that tool's or resource's statistics
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {f"{m.kind}:{m.name}": m.stats() for m in metrics}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def prometheus_text(server_name: str) -> str:
+    """
+    Render the metrics in the Prometheus text exposition format.
+
+    Args:
+        server_name: Value of the server label on every sample
+
+    Returns:
+        Exposition text
+    """
+    families = (
+        ("mcp_calls_total", "counter", "Calls started"),
+        ("mcp_errors_total", "counter", "Calls that raised an error"),
+        ("mcp_in_flight", "gauge", "Calls currently running"),
+        ("mcp_bytes_in_total", "counter", "Approximate argument bytes received"),
+        ("mcp_bytes_out_total", "counter", "Approximate result bytes returned"),
+        ("mcp_latency_seconds", "histogram", "Call latency"),
+    )
+    samples = {family: [] for family, _, _ in families}
+    for stats in metrics_snapshot().values():
+        labels = (f'server="{_label(server_name)}",kind="{stats["kind"]}",'
+                  f'name="{_label(stats["name"])}"')
+        samples["mcp_calls_total"].append(f"mcp_calls_total{{{labels}}} {stats['calls']}")
+        samples["mcp_errors_total"].append(f"mcp_errors_total{{{labels}}} {stats['errors']}")
+        samples["mcp_in_flight"].append(f"mcp_in_flight{{{labels}}} {stats['in_flight']}")
+        samples["mcp_bytes_in_total"].append(f"mcp_bytes_in_total{{{labels}}} {stats['bytes_in']}")
+        samples["mcp_bytes_out_total"].append(f"mcp_bytes_out_total{{{labels}}} {stats['bytes_out']}")
+        cumulative = 0
+        for bound, count in stats["latency_buckets"].items():
+            cumulative += count
+            samples["mcp_latency_seconds"].append(
+                f'mcp_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        samples["mcp_latency_seconds"].append(
+            f"mcp_latency_seconds_sum{{{labels}}} {stats['latency_sum_seconds']}")
+        samples["mcp_latency_seconds"].append(f"mcp_latency_seconds_count{{{labels}}} {cumulative}")
+
+    lines = []
+    for family, metric_type, help_text in families:
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {metric_type}")
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(server_name: str, host: str, port: int) -> ThreadingHTTPServer:
+    """
+    Serve the Prometheus text format at /metrics from a daemon thread.
+
+    Args:
+        server_name: Value of the server label on every sample
+        host: Interface to listen on
+        port: Port to listen on
+
+    Returns:
+        The running HTTP server
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text(server_name).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are frequent; keep them out of the server's stderr
+            pass
+
+    http_server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=http_server.serve_forever, name="metrics-http", daemon=True).start()
+    return http_server
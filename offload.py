@@ -0,0 +1,182 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union
+
+
+class _Limiter:
+    """Worker pool plus the global admission limits shared by every offloaded tool."""
+
+    def __init__(self, workers: int, max_concurrency: int, max_queued: int, timeout: Optional[float]):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+        self.workers = workers
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.queued = 0
+        self.running = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _remaining(self, loop, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - loop.time())
+
+    def _release(self, semaphores: list) -> None:
+        for semaphore in semaphores:
+            semaphore.release()
+        self.running -= 1
+
+    def _release_from_thread(self, loop, semaphores: list) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, semaphores)
+        except RuntimeError:
+            # The loop already closed at shutdown; nothing is waiting for the slots
+            pass
+
+    async def run(self, name: str, fn, tool_slots: Optional[asyncio.Semaphore], args, kwargs):
+        saturated = self.slots.locked() or (tool_slots is not None and tool_slots.locked())
+        if saturated and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise ValueError(f"Server busy: {self.queued} calls already queued, rejected {name}")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout if self.timeout else None
+        # The tool's own slot is taken first so calls waiting on a saturated tool
+        # don't hold global slots other tools could use
+        semaphores = ([tool_slots] if tool_slots is not None else []) + [self.slots]
+        acquired = []
+        self.queued += 1
+        try:
+            for semaphore in semaphores:
+                await asyncio.wait_for(semaphore.acquire(), self._remaining(loop, deadline))
+                acquired.append(semaphore)
+        except BaseException as e:
+            for semaphore in acquired:
+                semaphore.release()
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise ValueError(f"Timed out after {self.timeout}s waiting to run {name}") from None
+            raise
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        context = contextvars.copy_context()
+        future = self.pool.submit(context.run, functools.partial(fn, *args, **kwargs))
+        # Slots are only freed when the worker thread finishes, even if the caller
+        # stopped waiting, so the limits always bound the threads actually busy
+        future.add_done_callback(lambda _: self._release_from_thread(loop, acquired))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._remaining(loop, deadline))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise ValueError(f"Timed out after {self.timeout}s: {name}") from None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queued": self.max_queued,
+            "timeout": self.timeout,
+            "running": self.running,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+# Limiter installed by offload, for offload_stats
+_limiter = None
+
+
+def offload(server, workers: int, max_concurrency: int, max_queued: int,
+            timeout: Optional[float] = None, tool_limits: Optional[Dict[str, Union[int, str]]] = None) -> None:
+    """
+    Run the blocking tools and resources of a FastMCP server on a worker pool.
+
+    FastMCP calls synchronous tools directly on the event loop, so one slow
+    call stalls every other request. After offload(), each synchronous tool or
+    resource registered on the server is run on a thread pool instead. At most
+    max_concurrency calls run at once, and at most tool_limits[name] calls of
+    a given tool. A tool_limits entry may instead name another entry, so a
+    resource and the tool it wraps share one limit. Up to max_queued calls may wait for a slot; beyond that new
+    calls are rejected immediately. A call that has not finished within
+    timeout seconds, including time spent queued, returns an error; its
+    thread runs to completion and keeps its slot until then. Async tools are
+    registered unchanged. The module-level functions are returned unwrapped
+    so calls between tools stay synchronous.
+
+    Call it right after creating the server (after instrument(), so the
+    metrics include queueing), before any tool is registered.
+
+    Args:
+        server: FastMCP server
+        workers: Threads in the worker pool
+        max_concurrency: Calls allowed to run at once across all tools
+        max_queued: Calls allowed to wait for a slot before new ones are rejected
+        timeout: Seconds a call may take, or None for no limit
+        tool_limits: Calls allowed to run at once per tool or resource URI template,
+            or the name of the entry whose limit it shares
+    """
+    global _limiter
+    limiter = _limiter = _Limiter(workers, max_concurrency, max_queued, timeout)
+    tool_limits = tool_limits or {}
+    tool, resource = server.tool, server.resource
+    # One semaphore per limited entry, shared by every name that refers to it
+    semaphores = {}
+
+    def slots_for(name: str) -> Optional[asyncio.Semaphore]:
+        limit = tool_limits.get(name)
+        if isinstance(limit, str):
+            name, limit = limit, tool_limits.get(limit)
+        if limit is None:
+            return None
+        if name not in semaphores:
+            semaphores[name] = asyncio.Semaphore(limit)
+        return semaphores[name]
+
+    def offloaded(fn, name: str):
+        if inspect.iscoroutinefunction(fn):
+            return fn
+        tool_slots = slots_for(name)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await limiter.run(name, fn, tool_slots, args, kwargs)
+
+        return wrapper
+
+    def offloaded_tool(name: Optional[str] = None, description: Optional[str] = None):
+        register = tool(name=name, description=description)
+
+        def decorator(fn):
+            register(offloaded(fn, name or fn.__name__))
+            return fn
+
+        return decorator
+
+    def offloaded_resource(uri: str, **kwargs):
+        register = resource(uri, **kwargs)
+
+        def decorator(fn):
+            register(offloaded(fn, uri))
+            return fn
+
+        return decorator
+
+    server.tool = offloaded_tool
+    server.resource = offloaded_resource
+
+
+def offload_stats() -> Optional[dict]:
+    """
+    Get the worker pool's limits and current load.
+
+    Returns:
+        Dictionary with running, queued, rejected and timed-out call counts,
+        or None if offload has not been installed
+    """
+    return _limiter.stats() if _limiter is not None else None
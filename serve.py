@@ -0,0 +1,105 @@
+import argparse
+import os
+import uuid
+import weakref
+from typing import Optional
+
+from mcp.server.lowlevel.server import request_ctx
+
+from metrics import METRICS_HOST, METRICS_PORT, serve_metrics
+
+TRANSPORTS = ("stdio", "sse")
+
+# Defaults for the command-line options, overridable from the environment
+DEFAULT_TRANSPORT = os.environ.get("MCP_TRANSPORT", "stdio")
+DEFAULT_MAX_CONNECTIONS = int(os.environ.get("MCP_MAX_CONNECTIONS", 64))
+
+# Stable ids for live client sessions; entries go away with their session
+_session_ids = weakref.WeakKeyDictionary()
+
+
+def current_session_id() -> Optional[str]:
+    """
+    Identify the client session the current request belongs to.
+
+    Works in tools and resources, including ones run on a worker thread by
+    offload(), since the request context travels with the call.
+
+    Returns:
+        Opaque id unique to the calling session, or None outside a request
+    """
+    try:
+        session = request_ctx.get().session
+    except LookupError:
+        return None
+    session_id = _session_ids.get(session)
+    if session_id is None:
+        session_id = _session_ids.setdefault(session, uuid.uuid4().hex)
+    return session_id
+
+
+class _ConnectionLimit:
+    """ASGI middleware capping the number of open SSE streams."""
+
+    def __init__(self, app, sse_path: str, max_connections: int):
+        self.app = app
+        self.sse_path = sse_path
+        self.max_connections = max_connections
+        self.active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.sse_path:
+            await self.app(scope, receive, send)
+            return
+        if self.active >= self.max_connections:
+            body = f"Too many connections (limit {self.max_connections})".encode()
+            await send({"type": "http.response.start", "status": 503,
+                        "headers": [(b"content-type", b"text/plain"), (b"retry-after", b"1"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        self.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active -= 1
+
+
+def serve(server, description: Optional[str] = None) -> None:
+    """
+    Run a FastMCP server on the transport chosen on the command line.
+
+    With --transport stdio (the default) the server talks to the single
+    client that spawned it. With --transport sse it stays up as one
+    long-lived process serving many clients over HTTP/SSE on uvicorn, so
+    caches and warm state are shared between them. Each SSE connection is
+    its own MCP session, and at most --max-connections are open at once;
+    further connections get 503 until one closes. With --metrics-port (or
+    MCP_METRICS_PORT), Prometheus metrics are also served over HTTP at
+    /metrics on that port, for either transport.
+
+    Args:
+        server: FastMCP server to run
+        description: Help text for the command line
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=DEFAULT_TRANSPORT)
+    parser.add_argument("--host", default=server.settings.host, help="Interface to listen on (sse)")
+    parser.add_argument("--port", type=int, default=server.settings.port, help="Port to listen on (sse)")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Open SSE connections allowed at once (sse)")
+    parser.add_argument("--metrics-port", type=int, default=int(METRICS_PORT) if METRICS_PORT else None,
+                        help="Serve Prometheus metrics at /metrics on this port")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        serve_metrics(server.name, METRICS_HOST, args.metrics_port)
+
+    if args.transport == "stdio":
+        server.run(transport="stdio")
+        return
+
+    import uvicorn
+
+    app = _ConnectionLimit(server.sse_app(), server.settings.sse_path, args.max_connections)
+    uvicorn.run(app, host=args.host, port=args.port, log_level=server.settings.log_level.lower())
@@ -1,17 +1,28 @@
 from mcp.server.fastmcp import FastMCP
+from memoize import memoize, memo_stats
+from metrics import instrument
+from serve import serve
 
 mcp = FastMCP("Demo")
+instrument(mcp)
 
 @mcp.tool()
+@memoize()
 def add(a: int , b: int) -> int:
     """Add Two Numbers"""
 
     return a + b
 
 @mcp.resource("greeting://{name}")
+@memoize()
 def get_greeting(name : str)->str:
     """Get a greeting message"""
     return f"Hello, {name}!"
 
+@mcp.tool()
+def get_cache_stats() -> dict:
+    """Get hit-rate statistics for memoized tools"""
+    return {"memo": memo_stats()}
+
 if __name__=="__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    serve(mcp, "Demo MCP server")
\ No newline at end of file
@@ -3,9 +3,13 @@ from mcp.client.websocket import websocket_client
 import json
 import base64
 import asyncio
+import hashlib
 import os
+import time
 import dotenv
-from autogen_core.tools import BaseTool
+import anyio
+from mcp.shared.exceptions import McpError
+from autogen_core.tools import BaseTool, StaticWorkbench
 # from autogen_ext.tools.mcp import McpTool
 from typing import cast
 from openai.types.chat import ChatCompletionToolParam
@@ -68,6 +72,291 @@ server_params = SseServerParams(
 
 
 
+TOOL_CATALOG_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "mcp_tool_catalog.json")
+
+
+class ToolCatalogCache:
+    """
+    Tool lists of remote MCP servers cached on disk between runs.
+
+    Entries are keyed by a hash of the server URL (which carries the API key,
+    so it is never written out) and tagged with the server name and version
+    reported by initialize(); an entry is only used while those still match.
+    """
+
+    def __init__(self, path: str = TOOL_CATALOG_CACHE):
+        self.path = path
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _key(server_url: str) -> str:
+        return hashlib.sha256(server_url.encode()).hexdigest()
+
+    @staticmethod
+    def _version(server_info) -> str:
+        return f"{server_info.name}/{server_info.version}"
+
+    def load(self, server_url: str, server_info):
+        entry = self._read().get(self._key(server_url))
+        if entry is None or entry.get("version") != self._version(server_info):
+            return None
+        return [mcp.types.Tool.model_validate(tool) for tool in entry["tools"]]
+
+    def store(self, server_url: str, server_info, tools):
+        catalog = self._read()
+        catalog[self._key(server_url)] = {
+            "version": self._version(server_info),
+            "fetched_at": time.time(),
+            "tools": [tool.model_dump(mode="json") for tool in tools],
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(catalog, file)
+        os.replace(temp_path, self.path)
+
+
+tool_catalog_cache = ToolCatalogCache()
+
+
+async def refresh_tool_catalog(session, server_url: str, server_info, tools: list):
+    """Fetch the live tool list, update the disk cache and rebuild the adapters in place."""
+    result = await session.list_tools()
+    tool_catalog_cache.store(server_url, server_info, result.tools)
+    tools[:] = [SseMcpToolAdapter(server_params=server_params, tool=t, session=session)
+                for t in result.tools]
+    return result.tools
+
+
+async def watch_tool_catalog(session, server_url: str, server_info, tools: list):
+    """Refresh the catalog whenever the server sends notifications/tools/list_changed."""
+    # The session can't deliver the response to list_tools() until this loop
+    # has taken the next incoming message, so refreshes run in their own task;
+    # notifications arriving while one runs are coalesced into one more refresh.
+    changed = asyncio.Event()
+
+    async def refresh_when_changed():
+        while True:
+            await changed.wait()
+            changed.clear()
+            try:
+                await refresh_tool_catalog(session, server_url, server_info, tools)
+            except Exception as e:
+                print(f"Refreshing the tool catalog failed: {e}")
+
+    refresher = asyncio.create_task(refresh_when_changed())
+    try:
+        async for message in session.incoming_messages:
+            if isinstance(message, Exception):
+                continue
+            if isinstance(getattr(message, "root", None), mcp.types.ToolListChangedNotification):
+                changed.set()
+    finally:
+        refresher.cancel()
+
+
+class PooledConnection:
+    """One websocket MCP session kept open by a background task until closed."""
+
+    def __init__(self, url: str, on_notification=None):
+        self.url = url
+        self.session = None
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.error = None
+        self._on_notification = on_notification
+        self._ready = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._task = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self._closed.is_set()
+
+    async def start(self):
+        # The websocket and session contexts must be entered and exited in the
+        # same task, so they live in _run for the lifetime of the connection.
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    async def _run(self):
+        try:
+            async with websocket_client(self.url) as streams:
+                async with mcp.ClientSession(*streams) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    async with anyio.create_task_group() as tg:
+                        tg.start_soon(self._drain, session)
+                        await self._closed.wait()
+                        tg.cancel_scope.cancel()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+            self._closed.set()
+
+    async def _drain(self, session):
+        # Server notifications must be read or the session's receive loop stalls;
+        # the stream ending means the connection has dropped.
+        async for message in session.incoming_messages:
+            if self._on_notification is not None and not isinstance(message, Exception):
+                await self._on_notification(message)
+        self._closed.set()
+
+    async def call(self, coroutine, timeout):
+        """Await a request on this session, failing fast if the connection drops."""
+        request = asyncio.ensure_future(coroutine)
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            done, _ = await asyncio.wait({request, closed}, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+        if request in done:
+            return request.result()
+        request.cancel()
+        if not done:
+            raise asyncio.TimeoutError(f"MCP request timed out after {timeout}s")
+        raise ConnectionError(f"MCP connection to server closed: {self.error}")
+
+    async def close(self):
+        self._closed.set()
+        if self._task is not None:
+            await self._task
+
+
+class MCPSessionPool:
+    """
+    Shared, self-healing MCP sessions for one server URL.
+
+    Calls are multiplexed over up to max_connections sessions, each carrying up
+    to max_in_flight concurrent requests. Dropped connections are replaced and
+    the call retried once (tool calls only if they never reached the server);
+    a background task pings idle sessions and closes those beyond max_idle
+    that have been unused for idle_timeout seconds.
+    """
+
+    def __init__(self, url: str, max_connections: int = 4, max_in_flight: int = 16,
+                 max_idle: int = 1, idle_timeout: float = 60.0,
+                 health_check_interval: float = 30.0, call_timeout: float = 300.0,
+                 on_notification=None):
+        self.url = url
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.call_timeout = call_timeout
+        self.on_notification = on_notification
+        self._connections = []
+        self._condition = None
+        self._health_task = None
+
+    async def _acquire(self) -> PooledConnection:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while True:
+                self._connections = [c for c in self._connections if c.alive]
+                available = [c for c in self._connections if c.in_flight < self.max_in_flight]
+                if available:
+                    connection = min(available, key=lambda c: c.in_flight)
+                    break
+                if len(self._connections) < self.max_connections:
+                    connection = PooledConnection(self.url, self.on_notification)
+                    await connection.start()
+                    self._connections.append(connection)
+                    break
+                await self._condition.wait()
+            connection.in_flight += 1
+        if self._health_task is None and self.health_check_interval:
+            self._health_task = asyncio.create_task(self._health_loop())
+        return connection
+
+    async def _release(self, connection: PooledConnection):
+        async with self._condition:
+            connection.in_flight -= 1
+            connection.last_used = time.monotonic()
+            self._condition.notify()
+
+    async def request(self, make_request, retries: int = 1, idempotent: bool = True):
+        """
+        Run make_request(session) on a pooled session and return its result.
+        Transport failures close the connection and retry on a fresh one,
+        unless the request isn't idempotent and may already have reached the
+        server. Timeouts leave the connection open for the other requests on
+        it and are raised as is, as are errors returned by the server (McpError).
+        """
+        for attempt in range(retries + 1):
+            connection = await self._acquire()
+            sent = False
+            try:
+                if not connection.alive:
+                    raise ConnectionError(f"MCP connection to server closed: {connection.error}")
+                sent = True
+                return await connection.call(make_request(connection.session), self.call_timeout)
+            # asyncio.TimeoutError is an OSError on Python 3.11, so it must come first
+            except (McpError, asyncio.TimeoutError):
+                raise
+            except (ConnectionError, OSError, anyio.ClosedResourceError,
+                    anyio.BrokenResourceError, anyio.EndOfStream):
+                await connection.close()
+                if attempt == retries or (sent and not idempotent):
+                    raise
+            finally:
+                await self._release(connection)
+
+    async def call_tool(self, name: str, arguments: dict):
+        # Terminal commands may not be safe to run twice
+        return await self.request(lambda session: session.call_tool(name, arguments=arguments),
+                                  idempotent=False)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            idle = [c for c in self._connections if c.alive and c.in_flight == 0]
+            now = time.monotonic()
+            # Keep the most recently used idle sessions; close the rest once stale
+            idle.sort(key=lambda c: c.last_used, reverse=True)
+            for connection in idle[self.max_idle:]:
+                if now - connection.last_used >= self.idle_timeout:
+                    await connection.close()
+            for connection in idle[:self.max_idle]:
+                try:
+                    await connection.call(connection.session.send_ping(), self.health_check_interval)
+                except Exception:
+                    await connection.close()
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for connection in self._connections:
+            await connection.close()
+        self._connections = []
+
+
+_session_pools = {}
+
+
+def get_session_pool(url: str) -> MCPSessionPool:
+    """Return the shared session pool for url, creating it on first use."""
+    pool = _session_pools.get(url)
+    if pool is None:
+        pool = _session_pools[url] = MCPSessionPool(url)
+    return pool
+
+
 class MCP2AUTO(BaseTool):
 
     def __init__(
@@ -90,13 +379,8 @@ class MCP2AUTO(BaseTool):
     async def run(self, args, cancellation_token):
         ##how to call the mcp tool
         print(args)
-        async with websocket_client(url) as streams:
-            async with mcp.ClientSession(*streams) as session:
-
-                await session.initialize()
-
-                
-                result = await session.call_tool(self.name, arguments=args)
+        # Reuse a pooled, already-initialized session instead of connecting per call
+        result = await get_session_pool(self._url).call_tool(self.name, arguments=args)
         print(result)
         return result
 
@@ -106,18 +390,29 @@ async def main():
         async with mcp.ClientSession(*streams) as session:
             # Initialize the connection
             print("i am here")
-            await session.initialize()
+            init_result = await session.initialize()
             print("i am here")
-            # List available tools
-            tools_result = await session.list_tools()
-            tools = await mcp_server_tools(server_params=server_params, session=session)
+            server_info = init_result.serverInfo
+            # List available tools: start from the cached catalog when the server
+            # version matches and revalidate it in the background; otherwise
+            # fetch it once and cache it for the next start.
+            tools = []
+            catalog = tool_catalog_cache.load(url, server_info)
+            if catalog is None:
+                catalog = await refresh_tool_catalog(session, url, server_info, tools)
+                refresh_task = None
+            else:
+                tools[:] = [SseMcpToolAdapter(server_params=server_params, tool=t, session=session)
+                            for t in catalog]
+                refresh_task = asyncio.create_task(refresh_tool_catalog(session, url, server_info, tools))
+            watch_task = asyncio.create_task(watch_tool_catalog(session, url, server_info, tools))
 
             # adapter = await SseMcpToolAdapter.from_server_params(
             #     server_params,
             #     "list_directory",
             # )
             # tools = [adapter]
-            print(tools_result.tools[0])
+            print(catalog[0])
             # return
             # tools = [McpTool(session=session, tool=t) for t in tools_result.tools]
 
@@ -144,7 +439,7 @@ async def main():
 
 
 
-            print(f"Available tools: {', '.join([t.name for t in tools_result.tools])}")
+            print(f"Available tools: {', '.join([t.name for t in catalog])}")
 
             model_client = OpenAIChatCompletionClient(
             model="gemini-2.0-flash",
@@ -152,8 +447,12 @@ async def main():
             api_type='google'
             )
             print("model client loaded")
+            # AssistantAgent copies a tools= list when it is built, so catalog
+            # refreshes would never reach it; a StaticWorkbench keeps a reference
+            # to our list and the agent asks it for the tools on every model call.
             fetch_agent = AssistantAgent(
-                name="fetcher", model_client=model_client, tools=tools, reflect_on_tool_use=True
+                name="fetcher", model_client=model_client, workbench=StaticWorkbench(tools),
+                reflect_on_tool_use=True
             )
             print("fetcher agent defined")
             # Let the agent fetch the content of a URL and summarize it.
@@ -166,6 +465,11 @@ async def main():
 
             # Close the connection to the model client.
             await model_client.close()
+            for pool in _session_pools.values():
+                await pool.close()
+            watch_task.cancel()
+            if refresh_task is not None:
+                await refresh_task
                 # Example of calling a tool:
                 # result = await session.call_tool("tool-name", arguments={"arg1": "value"})
 
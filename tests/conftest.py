@@ -0,0 +1,32 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# The servers are scripts, not a package: make them and their helper modules importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "filesystem")]
+
+
+@pytest.fixture
+def call_with_timeout():
+    """Call a function on a thread and fail, rather than hang, if it blocks."""
+    def call(fn, *args, **kwargs):
+        result = {}
+
+        def run():
+            try:
+                result["value"] = fn(*args, **kwargs)
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(30)
+        assert not thread.is_alive(), f"{fn.__name__} blocked"
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    return call
@@ -0,0 +1,91 @@
+import pytest
+
+import filesystem_server as fs
+
+
+def test_apply_patch_follows_offset_hunks(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1, 11)))
+    # Both hunks name lines two above where their context really is
+    patch = (
+        "--- a/file.txt\n"
+        "+++ b/file.txt\n"
+        "@@ -1,3 +1,3 @@\n"
+        " line 3\n"
+        "-line 4\n"
+        "+line four\n"
+        " line 5\n"
+        "@@ -6,3 +6,4 @@\n"
+        " line 8\n"
+        "+line 8.5\n"
+        " line 9\n"
+        " line 10\n"
+    )
+
+    result = fs.apply_patch(str(path), patch)
+
+    expected = [f"line {i}" for i in range(1, 11)]
+    expected[3] = "line four"
+    expected.insert(8, "line 8.5")
+    assert path.read_text().splitlines() == expected
+    assert result["size"] == path.stat().st_size
+
+
+def test_apply_patch_rejects_context_mismatch(tmp_path):
+    path = tmp_path / "file.txt"
+    original = "alpha\nbeta\ngamma\n"
+    path.write_text(original)
+    patch = (
+        "--- a/file.txt\n"
+        "+++ b/file.txt\n"
+        "@@ -1,2 +1,2 @@\n"
+        " alpha\n"
+        "-beta\n"
+        "+BETA\n"
+        "@@ -3,1 +3,1 @@\n"
+        "-delta\n"
+        "+DELTA\n"
+    )
+
+    with pytest.raises(ValueError, match="Hunk 2 does not apply"):
+        fs.apply_patch(str(path), patch)
+    # The first hunk matched, but nothing is written unless every hunk applies
+    assert path.read_text() == original
+
+
+def test_apply_patch_keeps_form_feeds_inside_lines(tmp_path):
+    path = tmp_path / "file.c"
+    path.write_text("int a;\n\x0c/* page two */\nint b;\n")
+    patch = (
+        "@@ -1,3 +1,3 @@\n"
+        " int a;\n"
+        " \x0c/* page two */\n"
+        "-int b;\n"
+        "+int c;\n"
+    )
+
+    fs.apply_patch(str(path), patch)
+
+    assert path.read_text() == "int a;\n\x0c/* page two */\nint c;\n"
+
+
+@pytest.mark.parametrize("original,edit,expected", [
+    # Replacing the last line keeps the file's final newline
+    ("a\nb\n", {"start": 2, "end": 2, "content": "B"}, "a\nB\n"),
+    # ... and its absence
+    ("a\nb", {"start": 2, "end": 2, "content": "B"}, "a\nB"),
+    ("a\nb\nc\n", {"start": 2, "end": 2, "content": "B"}, "a\nB\nc\n"),
+    ("a\r\nb\r\n", {"start": 2, "end": 2, "content": "B"}, "a\r\nB\r\n"),
+    ("a\nb\n", {"start": 1, "end": 0, "content": "z"}, "z\na\nb\n"),
+    # Appending after a last line without a newline starts a new line
+    ("a\nb", {"start": 3, "end": 2, "content": "c"}, "a\nb\nc"),
+    ("a\nb\n", {"start": 3, "end": 2, "content": "c"}, "a\nb\nc\n"),
+    ("a\nb\nc\n", {"start": 2, "end": 3, "content": ""}, "a\n"),
+])
+def test_replace_range_lines_keep_their_endings(tmp_path, original, edit, expected):
+    path = tmp_path / "file.txt"
+    path.write_bytes(original.encode())
+
+    fs.replace_range(str(path), [edit])
+
+    assert path.read_bytes() == expected.encode()
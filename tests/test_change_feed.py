@@ -0,0 +1,84 @@
+import asyncio
+import gc
+import time
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import filesystem_server as fs
+
+
+def _event(seq, kind, path, **extra):
+    return dict({"seq": seq, "type": kind, "path": path, "is_dir": False}, **extra)
+
+
+def test_coalesce_changes_folds_create_modify_delete():
+    events = [
+        _event(1, "created", "/a"),
+        _event(2, "modified", "/a"),
+        _event(3, "created", "/b"),
+        _event(4, "deleted", "/b"),
+        _event(5, "deleted", "/c"),
+        _event(6, "created", "/c"),
+        _event(7, "modified", "/d"),
+        _event(8, "modified", "/d"),
+    ]
+
+    assert fs._coalesce_changes(events) == [
+        {"type": "created", "path": "/a", "is_dir": False},
+        {"type": "modified", "path": "/c", "is_dir": False},
+        {"type": "modified", "path": "/d", "is_dir": False},
+    ]
+
+
+def test_coalesce_changes_stops_folding_at_moves():
+    events = [
+        _event(1, "created", "/a"),
+        _event(2, "moved", "/b", old_path="/a"),
+        _event(3, "modified", "/b"),
+        _event(4, "deleted", "/a"),
+    ]
+
+    assert fs._coalesce_changes(events) == [
+        {"type": "created", "path": "/a", "is_dir": False},
+        {"type": "moved", "path": "/b", "is_dir": False, "old_path": "/a"},
+        {"type": "modified", "path": "/b", "is_dir": False},
+        {"type": "deleted", "path": "/a", "is_dir": False},
+    ]
+
+
+async def _subscribe(directory, unsubscribe):
+    async with create_connected_server_and_client_session(fs.mcp._mcp_server) as client:
+        await client.subscribe_resource(f"dir://{directory}")
+        feed = fs._feeds[(directory, False)]
+        assert fs._notify_subscribers in feed.listeners
+        if unsubscribe:
+            await client.unsubscribe_resource(f"dir://{directory}")
+    return feed
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + 10
+    while not condition() and time.monotonic() < deadline:
+        gc.collect()
+        time.sleep(0.05)
+    return condition()
+
+
+def test_unsubscribe_stops_and_evicts_the_feed(tmp_path):
+    directory = str(tmp_path)
+
+    feed = asyncio.run(_subscribe(directory, unsubscribe=True))
+
+    assert feed.stop_event.is_set()
+    assert (directory, False) not in fs._feeds
+    assert not any(s["directory"] == directory for s in fs._subscriptions.values())
+
+
+def test_closed_session_releases_its_subscriptions(tmp_path):
+    directory = str(tmp_path)
+
+    feed = asyncio.run(_subscribe(directory, unsubscribe=False))
+
+    assert _wait_until(feed.stop_event.is_set)
+    assert (directory, False) not in fs._feeds
+    assert not any(s["directory"] == directory for s in fs._subscriptions.values())
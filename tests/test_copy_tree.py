@@ -0,0 +1,54 @@
+import os
+import shutil
+
+import pytest
+
+import filesystem_server as fs
+
+
+def test_copy_tree_copies_files_and_recreates_links(tmp_path):
+    source = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "file").write_bytes(b"x" * 1000)
+    (source / "sub" / "nested").write_text("nested")
+    (source / "link").symlink_to("file")
+
+    result = fs.copy_tree(str(source), str(tmp_path / "copy"))
+
+    copy = tmp_path / "copy"
+    assert (copy / "file").read_bytes() == b"x" * 1000
+    assert (copy / "sub" / "nested").read_text() == "nested"
+    assert os.readlink(copy / "link") == "file"
+    assert result["files"] == 2
+    assert result["errors"] == []
+
+
+def test_copy_tree_reports_fifo_instead_of_hanging(tmp_path, call_with_timeout):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "file").write_text("data")
+    os.mkfifo(source / "pipe")
+
+    result = call_with_timeout(fs.copy_tree, str(source), str(tmp_path / "copy"))
+
+    assert (tmp_path / "copy" / "file").read_text() == "data"
+    assert [os.path.basename(error["path"]) for error in result["errors"]] == ["pipe"]
+    assert not (tmp_path / "copy" / "pipe").exists()
+
+
+def test_copy_file_refuses_same_file(tmp_path):
+    path = tmp_path / "file"
+    path.write_text("data")
+    (tmp_path / "alias").symlink_to(path)
+
+    with pytest.raises(shutil.SameFileError):
+        fs.copy_file(str(path), str(tmp_path / "alias"))
+    assert path.read_text() == "data"
+
+
+def test_copy_file_refuses_fifo_destination(tmp_path, call_with_timeout):
+    (tmp_path / "file").write_text("data")
+    os.mkfifo(tmp_path / "pipe")
+
+    with pytest.raises(shutil.SpecialFileError):
+        call_with_timeout(fs.copy_file, str(tmp_path / "file"), str(tmp_path / "pipe"))
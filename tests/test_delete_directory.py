@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+import filesystem_server as fs
+
+
+def _tree(root):
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "b" / "file").write_text("data")
+    (root / "top").write_text("data")
+
+
+def test_delete_directory_removes_tree(tmp_path):
+    target = tmp_path / "tree"
+    _tree(target)
+
+    assert fs.delete_directory(str(target), recursive=True) is True
+    assert not target.exists()
+
+
+def test_delete_directory_refuses_symlink_to_directory(tmp_path):
+    target = tmp_path / "tree"
+    _tree(target)
+    link = tmp_path / "link"
+    link.symlink_to(target, target_is_directory=True)
+
+    with pytest.raises(ValueError, match="symbolic link"):
+        fs.delete_directory(str(link), recursive=True)
+    assert (target / "a" / "b" / "file").read_text() == "data"
+    assert link.is_symlink()
+
+
+def test_delete_directory_removes_links_without_following_them(tmp_path):
+    outside = tmp_path / "outside"
+    _tree(outside)
+    target = tmp_path / "tree"
+    _tree(target)
+    (target / "a" / "dir_link").symlink_to(outside, target_is_directory=True)
+    (target / "file_link").symlink_to(outside / "top")
+
+    fs.delete_directory(str(target), recursive=True)
+
+    assert not target.exists()
+    assert (outside / "a" / "b" / "file").read_text() == "data"
+    assert (outside / "top").read_text() == "data"
+
+
+def test_delete_directory_background_job(tmp_path):
+    target = tmp_path / "tree"
+    _tree(target)
+
+    job_id = fs.delete_directory(str(target), recursive=True, background=True)
+    deadline = time.monotonic() + 10
+    while fs.get_job(job_id)["status"] in ("pending", "running") and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert fs.get_job(job_id)["status"] == "completed"
+    assert not target.exists()
@@ -0,0 +1,41 @@
+import os
+
+import filesystem_server as fs
+from grep_worker import grep_file
+
+
+def test_grep_files_skips_fifos(tmp_path, call_with_timeout):
+    (tmp_path / "a.txt").write_text("needle one\n")
+    os.mkfifo(tmp_path / "pipe")
+    (tmp_path / "z.txt").write_text("no match\nneedle two\n")
+
+    result = call_with_timeout(fs.grep_files, str(tmp_path), "needle")
+
+    assert [(os.path.basename(m["path"]), m["line_number"]) for m in result["matches"]] == [
+        ("a.txt", 1), ("z.txt", 2)]
+    assert result["files_searched"] == 2
+
+
+def test_grep_file_refuses_fifo_without_blocking(tmp_path, call_with_timeout):
+    os.mkfifo(tmp_path / "pipe")
+
+    assert call_with_timeout(grep_file, str(tmp_path / "pipe"), b"x", 0, 0, 0, 10) == ([], False)
+
+
+def test_grep_files_cursor_resumes_in_walk_order(tmp_path):
+    for directory in ("", "b", "b/c", "a"):
+        (tmp_path / directory).mkdir(exist_ok=True)
+        for name in ("2.txt", "1.txt"):
+            (tmp_path / directory / name).write_text("hit\nhit\n")
+
+    seen = []
+    cursor = None
+    while True:
+        result = fs.grep_files(str(tmp_path), "hit", max_results=3, cursor=cursor)
+        seen.extend((os.path.relpath(m["path"], tmp_path), m["line_number"]) for m in result["matches"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+
+    files = ["1.txt", "2.txt", "a/1.txt", "a/2.txt", "b/1.txt", "b/2.txt", "b/c/1.txt", "b/c/2.txt"]
+    assert seen == [(path, line) for path in files for line in (1, 2)]
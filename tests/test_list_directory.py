@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import filesystem_server as fs
+
+
+@pytest.mark.parametrize("sort,reverse", [("name", False), ("name", True), ("size", False), ("mtime", True)])
+def test_list_directory_cursor_pages_through_every_entry(tmp_path, sort, reverse):
+    for i in range(7):
+        (tmp_path / f"file{i}").write_bytes(b"x" * (i * 10))
+        os.utime(tmp_path / f"file{i}", (1_000_000 + i, 1_000_000 + i))
+    (tmp_path / "subdir").mkdir()
+
+    names = []
+    cursor = None
+    pages = 0
+    while True:
+        page = fs.list_directory(str(tmp_path), page_size=3, cursor=cursor, sort=sort, reverse=reverse,
+                                 entry_type="file", include_details=True)
+        names.extend(entry["name"] for entry in page["entries"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = [f"file{i}" for i in range(7)]
+    assert names == (expected[::-1] if reverse else expected)
+    assert pages == 3
+
+
+def test_list_directory_rejects_cursor_from_other_sort(tmp_path):
+    for i in range(3):
+        (tmp_path / f"file{i}").touch()
+    page = fs.list_directory(str(tmp_path), page_size=1)
+
+    with pytest.raises(ValueError, match="different sort order"):
+        fs.list_directory(str(tmp_path), page_size=1, cursor=page["next_cursor"], sort="size")
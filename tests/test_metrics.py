@@ -0,0 +1,17 @@
+import metrics
+
+
+def test_payload_size_counts_strings_and_bytes_inside_containers():
+    result = {"path": "/tmp/a", "content": "x" * 1000, "chunks": [b"ab", bytearray(b"cd"), ("ef",)]}
+
+    assert metrics._payload_size(result) == len("path/tmp/acontent") + 1000 + len("chunks") + 6
+
+
+def test_payload_size_charges_scalars_a_constant_without_serializing():
+    class Unserializable:
+        def __str__(self):
+            raise AssertionError("payload was serialized")
+
+    value = {"n": 12345678901234567890, "ok": True, "missing": None, "other": Unserializable()}
+
+    assert metrics._payload_size(value) == len("nokmissingother") + 3 * metrics.SCALAR_SIZE
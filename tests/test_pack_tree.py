@@ -0,0 +1,130 @@
+import base64
+import os
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+import pytest
+
+import filesystem_server as fs
+
+
+def _tree(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "a.txt").write_text("alpha")
+    (root / "sub" / "b.txt").write_text("beta")
+
+
+def _fetch(archive_id, path):
+    offset = 0
+    with open(path, "wb") as file:
+        while True:
+            chunk = fs.read_archive(archive_id, offset)
+            file.write(base64.b64decode(chunk["data"]))
+            offset = chunk["next_offset"]
+            if chunk["eof"]:
+                return
+
+
+def test_pack_tree_round_trip(tmp_path):
+    source = tmp_path / "source"
+    _tree(source)
+
+    result = fs.pack_tree(str(source), str(tmp_path / "out.tar.gz"))
+
+    with tarfile.open(tmp_path / "out.tar.gz") as archive:
+        assert sorted(archive.getnames()) == ["a.txt", "sub", "sub/b.txt"]
+        assert archive.extractfile("sub/b.txt").read() == b"beta"
+    assert result["files"] == 2
+
+
+def test_pack_tree_zip_skips_fifo(tmp_path, call_with_timeout):
+    source = tmp_path / "source"
+    _tree(source)
+    os.mkfifo(source / "pipe")
+
+    result = call_with_timeout(fs.pack_tree, str(source), str(tmp_path / "out.zip"), format="zip")
+
+    assert result["skipped"] == ["pipe"]
+    with zipfile.ZipFile(tmp_path / "out.zip") as archive:
+        assert sorted(archive.namelist()) == ["a.txt", "sub/", "sub/b.txt"]
+
+
+@pytest.mark.parametrize("format", ["tar", "zip"])
+def test_pack_tree_leaves_destination_inside_source_out(tmp_path, format):
+    source = tmp_path / "source"
+    _tree(source)
+    destination = source / f"self.{format}"
+
+    # The second run also has the first run's archive in the tree
+    for _ in range(2):
+        fs.pack_tree(str(source), str(destination), format=format)
+
+    if format == "zip":
+        with zipfile.ZipFile(destination) as archive:
+            names = archive.namelist()
+    else:
+        with tarfile.open(destination) as archive:
+            names = archive.getnames()
+    assert not any(name.startswith(("self.", ".self.")) for name in names)
+
+
+def test_pack_tree_held_archive_is_not_packed_into_itself(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    _tree(source)
+    monkeypatch.setattr(tempfile, "tempdir", str(source))
+
+    result = fs.pack_tree(str(source), format="tar")
+    _fetch(result["archive_id"], tmp_path / "held.tar")
+    fs.release_archive(result["archive_id"])
+
+    with tarfile.open(tmp_path / "held.tar") as archive:
+        assert sorted(archive.getnames()) == ["a.txt", "sub", "sub/b.txt"]
+
+
+def test_pack_tree_archive_limit_holds_under_concurrency(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    _tree(source)
+    monkeypatch.setattr(fs, "MAX_ARCHIVE_BLOBS", len(fs._archives) + 2)
+    archive_ids = []
+    errors = []
+
+    def pack():
+        try:
+            archive_ids.append(fs.pack_tree(str(source))["archive_id"])
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=pack) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        assert len(archive_ids) == 2
+        assert len(errors) == 4
+    finally:
+        for archive_id in archive_ids:
+            fs.release_archive(archive_id)
+
+
+def test_idle_archives_and_uploads_expire(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    _tree(source)
+    archive_id = fs.pack_tree(str(source))["archive_id"]
+    archive_path = fs._archives[archive_id]["path"]
+    upload_id = fs.begin_upload(str(tmp_path / "upload"))
+    upload_path = fs._uploads[upload_id]["temp_path"]
+
+    monkeypatch.setattr(fs, "TRANSFER_IDLE_TTL", -1)
+    fs._expire_idle(fs._archives, fs._archives_lock, "path")
+    fs._expire_idle(fs._uploads, fs._uploads_lock, "temp_path")
+
+    with pytest.raises(ValueError, match="Unknown archive id"):
+        fs.read_archive(archive_id)
+    with pytest.raises(ValueError, match="Unknown upload id"):
+        fs.upload_chunk(upload_id, "data")
+    assert not os.path.exists(archive_path)
+    assert not os.path.exists(upload_path)
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+import filesystem_server as fs
+
+
+def _lines(tmp_path, count):
+    path = tmp_path / "file.log"
+    path.write_text("".join(f"line {i}\n" for i in range(count)))
+    return str(path)
+
+
+def test_read_file_line_range(tmp_path):
+    path = _lines(tmp_path, 1000)
+
+    result = fs.read_file(path, start_line=5, max_lines=2)
+
+    assert result["content"] == "line 5\nline 6\n"
+    assert result["next_offset"] == result["offset"] + len("line 5\nline 6\n")
+    assert not result["eof"]
+
+
+def test_read_file_start_line_past_end(tmp_path):
+    path = _lines(tmp_path, 10)
+
+    result = fs.read_file(path, start_line=50)
+
+    assert result["content"] == ""
+    assert result["eof"]
+
+
+def test_read_file_survives_file_shrinking_mid_read(tmp_path, monkeypatch):
+    path = _lines(tmp_path, 10)
+    real_fstat = os.fstat
+
+    def stale_fstat(fd):
+        # Report the size the file had before it was truncated
+        return os.stat_result(real_fstat(fd)[:6] + (10 * 1024 * 1024,) + real_fstat(fd)[7:])
+
+    monkeypatch.setattr(fs.os, "fstat", stale_fstat)
+    result = fs.read_file(path, offset=7, length=1024 * 1024)
+
+    assert result["content"] == "".join(f"line {i}\n" for i in range(10))[7:]
+    assert result["eof"]
+
+
+def test_read_files_stays_within_the_batch_budget(tmp_path, monkeypatch):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"file{i}"
+        path.write_bytes(b"x" * 400)
+        paths.append(str(path))
+    monkeypatch.setattr(fs, "MAX_BATCH_READ_BYTES", 1000)
+
+    results = fs.read_files(paths)
+
+    returned = sum(len(r["result"]["content"]) for r in results if "result" in r)
+    assert returned == 1000
+    assert [r["path"] for r in results] == paths
+    assert sum(1 for r in results if "limit" in r.get("error", "")) == 3
+
+
+def test_read_files_rejects_non_positive_length(tmp_path):
+    (tmp_path / "file").write_text("data")
+
+    with pytest.raises(ValueError, match="Length must be positive"):
+        fs.read_files([str(tmp_path / "file")], length=0)
+
+
+def test_read_files_reads_each_range(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name).write_text(f"{name * 3}-tail")
+
+    results = fs.read_files([str(tmp_path / "a"), str(tmp_path / "b")], offset=1, length=3)
+
+    assert [r["result"]["content"] for r in results] == ["aa-", "bb-"]
@@ -0,0 +1,192 @@
+import asyncio
+import importlib
+import os
+
+import pytest
+
+pytest.importorskip("autogen_agentchat")
+pytest.importorskip("autogen_ext.tools.mcp")
+
+import mcp.types  # noqa: E402
+from mcp.server.fastmcp import Context, FastMCP  # noqa: E402
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def terminal():
+    # The module reads its API keys at import time
+    for key in ("github_token", "smithey-key", "API_KEY"):
+        os.environ.setdefault(key, "test")
+    return importlib.import_module("terminal_commands_server")
+
+
+def _catalog_server():
+    server = FastMCP("catalog")
+
+    @server.tool()
+    async def announce(ctx: Context) -> str:
+        """Tell the client its tool list changed, twice in a row."""
+        await ctx.session.send_tool_list_changed()
+        await ctx.session.send_tool_list_changed()
+        return "announced"
+
+    @server.tool()
+    def echo(text: str) -> str:
+        """Return the text."""
+        return text
+
+    return server
+
+
+def test_watch_tool_catalog_refreshes_without_blocking_requests(terminal, tmp_path, monkeypatch):
+    monkeypatch.setattr(terminal, "tool_catalog_cache", terminal.ToolCatalogCache(str(tmp_path / "catalog.json")))
+
+    async def scenario():
+        async with create_connected_server_and_client_session(_catalog_server()._mcp_server) as session:
+            tools = []
+            info = mcp.types.Implementation(name="catalog", version="1")
+            watcher = asyncio.create_task(terminal.watch_tool_catalog(session, "memory://catalog", info, tools))
+            try:
+                result = await asyncio.wait_for(session.call_tool("announce", {}), 10)
+                assert result.content[0].text == "announced"
+                listed = await asyncio.wait_for(session.list_tools(), 10)
+                echoed = await asyncio.wait_for(session.call_tool("echo", {"text": "hi"}), 10)
+                assert echoed.content[0].text == "hi"
+                for _ in range(100):
+                    if tools:
+                        break
+                    await asyncio.sleep(0.05)
+            finally:
+                watcher.cancel()
+            return listed, tools
+
+    listed, tools = asyncio.run(scenario())
+
+    assert sorted(tool.name for tool in listed.tools) == ["announce", "echo"]
+    assert sorted(tool.name for tool in tools) == ["announce", "echo"]
+
+
+class _FakeConnection:
+    """Stands in for PooledConnection: runs requests directly and records closes."""
+
+    instances = []
+
+    def __init__(self, url, on_notification=None):
+        self.session = object()
+        self.in_flight = 0
+        self.last_used = 0.0
+        self.error = None
+        self.closed = False
+        # Answers for successive alive checks; True once exhausted
+        self.alive_answers = []
+        _FakeConnection.instances.append(self)
+
+    @property
+    def alive(self):
+        if self.alive_answers:
+            return self.alive_answers.pop(0)
+        return not self.closed
+
+    async def start(self):
+        pass
+
+    async def call(self, coroutine, timeout):
+        return await coroutine
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(terminal, monkeypatch):
+    _FakeConnection.instances = []
+    monkeypatch.setattr(terminal, "PooledConnection", _FakeConnection)
+    return terminal.MCPSessionPool("memory://pool", health_check_interval=0)
+
+
+def _failing(error, attempts):
+    def make_request(session):
+        attempts.append(session)
+
+        async def request():
+            raise error
+        return request()
+    return make_request
+
+
+def test_pool_timeout_keeps_connection_and_does_not_retry(pool):
+    attempts = []
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pool.request(_failing(asyncio.TimeoutError("slow"), attempts)))
+
+    assert len(attempts) == 1
+    assert not _FakeConnection.instances[0].closed
+
+
+def test_pool_retries_idempotent_request_on_connection_error(pool):
+    attempts = []
+
+    def make_request(session):
+        attempts.append(session)
+
+        async def request():
+            if len(attempts) == 1:
+                raise ConnectionError("dropped")
+            return "ok"
+        return request()
+
+    assert asyncio.run(pool.request(make_request)) == "ok"
+    assert len(attempts) == 2
+    assert _FakeConnection.instances[0].closed
+
+
+def test_pool_does_not_rerun_tool_call_that_may_have_been_sent(pool, monkeypatch):
+    attempts = []
+
+    async def call_tool(name, arguments):
+        attempts.append(name)
+        raise ConnectionError("dropped mid-call")
+
+    class Session:
+        pass
+
+    session = Session()
+    session.call_tool = call_tool
+    monkeypatch.setattr(_FakeConnection, "__init__", _with_session(session))
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.call_tool("run_command", {"command": "rm -rf build"}))
+    assert attempts == ["run_command"]
+
+
+def test_pool_retries_tool_call_that_never_left(pool, monkeypatch):
+    attempts = []
+
+    async def call_tool(name, arguments):
+        attempts.append(name)
+        return "done"
+
+    class Session:
+        pass
+
+    session = Session()
+    session.call_tool = call_tool
+    monkeypatch.setattr(_FakeConnection, "__init__", _with_session(session, dead_after_acquire=True))
+
+    assert asyncio.run(pool.call_tool("run_command", {})) == "done"
+    assert attempts == ["run_command"]
+    assert _FakeConnection.instances[0].closed
+
+
+def _with_session(session, dead_after_acquire=False):
+    init = _FakeConnection.__init__
+
+    def __init__(self, url, on_notification=None):
+        init(self, url, on_notification)
+        self.session = session
+        if dead_after_acquire and len(_FakeConnection.instances) == 1:
+            # Dropped between the pool handing it out and the request starting
+            self.alive_answers = [False]
+
+    return __init__